@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Forwarding benchmark - webhook and file delivery throughput
+
+Starts the local webhook receiver (webhook_receiver.py) in-process and
+pushes messages through the forwarding stage to an "http" forwarder, with
+and without gzip and with the receiver failing every 10th request, and to a
+"file" forwarder. Reports throughput, bytes on the wire, HTTP connections
+used (keep-alive should need one) and checks every message arrived.
+
+Usage: python benchmarks/bench_forwarding.py [--messages 100000] [--batch-size 500]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mqtt_django.settings')
+os.environ.setdefault('MQTT_AUTOSTART', 'False')
+
+
+def build_messages(count):
+    from django.utils import timezone
+    from mqtt_service.models import MQTTMessage
+    now = timezone.now()
+    messages = []
+    for i in range(count):
+        data = {'device': f'dev-{i % 100}', 'temperature': 20 + i % 10 / 10, 'seq': i}
+        messages.append(MQTTMessage(
+            id=i + 1, topic=f'sensors/{i % 100}/telemetry', payload=json.dumps(data),
+            decoded=data, qos=0, retain=False, timestamp=now))
+    return messages
+
+
+def run(config, messages, batch_size):
+    from mqtt_service.forwarding import ForwardingStage
+    stage = ForwardingStage([config])
+    forwarder = stage.forwarders[0]
+    stage.start()
+    started = time.perf_counter()
+    for offset in range(0, len(messages), batch_size):
+        stage.forward(messages[offset:offset + batch_size])
+    while forwarder.stats['delivered'] + forwarder.stats['failed'] + \
+            forwarder.stats['dropped'] < len(messages):
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    stage.stop()
+    return elapsed, forwarder.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    import django
+    django.setup()
+    from webhook_receiver import WebhookReceiver
+
+    messages = build_messages(args.messages)
+    common = {'batch_size': args.batch_size, 'flush_interval': 0.05,
+              'queue_size': args.messages}
+
+    print(f"{args.messages} messages, batches of {args.batch_size}")
+    print(f"{'sink':<24}{'msg/s':>10}{'MB sent':>9}{'conns':>7}{'retries':>9}{'received':>10}")
+    for name, options, fail_every in [
+        ('http', {'gzip': False}, 0),
+        ('http + gzip', {'gzip': True}, 0),
+        ('http + gzip, 10% 503', {'gzip': True}, 10),
+    ]:
+        server = WebhookReceiver(('127.0.0.1', 0), fail_every)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/hook'
+        elapsed, stats = run({'name': name, 'type': 'http', 'url': url,
+                              **options, **common}, messages, args.batch_size)
+        server.shutdown()
+        received = len({message['id'] for message in server.messages})
+        print(f"{name:<24}{args.messages / elapsed:>10.0f}"
+              f"{server.bytes_received / 1e6:>9.1f}{server.connections:>7}"
+              f"{stats['retries']:>9}{received:>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'messages.jsonl')
+        elapsed, stats = run({'name': 'file', 'type': 'file', 'path': path, **common},
+                             messages, args.batch_size)
+        with open(path, 'rb') as f:
+            received = sum(1 for _ in f)
+        print(f"{'file':<24}{args.messages / elapsed:>10.0f}"
+              f"{os.path.getsize(path) / 1e6:>9.1f}{'-':>7}{stats['retries']:>9}{received:>10}")
+
+
+if __name__ == '__main__':
+    main()
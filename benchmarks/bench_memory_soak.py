@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Memory soak test - RSS of the ingest pipeline over millions of messages
+
+Pushes messages through the real ingest pipeline (queue, writer thread,
+bulk INSERTs) into a throwaway file-backed SQLite database with the
+project's settings (DEBUG defaults to True), sampling RSS as it goes. After
+a warm-up, RSS must stay within --max-growth-mb or the script exits with
+status 1. --no-guard disables the database guard to show the growth it
+prevents; --tracemalloc prints the top allocators at the end.
+
+Usage: python benchmarks/bench_memory_soak.py [--messages 2000000] [--max-growth-mb 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mqtt_django.settings')
+os.environ.setdefault('MQTT_AUTOSTART', 'False')
+
+TOPICS = 1000
+SAMPLES = 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=2000000)
+    parser.add_argument('--warmup', type=float, default=0.1,
+                        help='Fraction of messages sent before the RSS baseline')
+    parser.add_argument('--max-growth-mb', type=float, default=20)
+    parser.add_argument('--no-guard', action='store_true')
+    parser.add_argument('--tracemalloc', action='store_true')
+    args = parser.parse_args()
+
+    if args.tracemalloc:
+        os.environ['MQTT_MEMORY_PROFILING'] = 'True'
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from mqtt_service.ingest import IngestPipeline
+    from mqtt_service.memory import guard, memory_profiler, rss_bytes
+    from mqtt_service.metrics import metrics
+
+    setup_test_environment()
+    # setup_test_environment() forces DEBUG off; soak with the configured value
+    settings.DEBUG = os.environ.get('DEBUG', 'True') == 'True'
+    guard.enabled = not args.no_guard
+
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'soak.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0)
+        pipeline = IngestPipeline.get_instance()
+        pipeline.start()
+        try:
+            payloads = [f'{{"temperature": {20 + i % 100 / 10}, "seq": {i}}}'.encode()
+                        for i in range(TOPICS)]
+            topics = [f'soak/device-{i}/telemetry' for i in range(TOPICS)]
+            limit = settings.MQTT_INGEST_QUEUE_SIZE // 2
+            warmup = int(args.messages * args.warmup)
+            every = max(1, (args.messages - warmup) // SAMPLES)
+            baseline = None
+            samples = []
+
+            print(f"{args.messages} messages, DEBUG={settings.DEBUG}, "
+                  f"guard {'off' if args.no_guard else 'on'}")
+            started = time.perf_counter()
+            for i in range(args.messages):
+                while metrics.queue_depth() > limit:
+                    time.sleep(0.001)
+                pipeline.submit(topics[i % TOPICS], payloads[i % TOPICS], 0, False)
+                if i == warmup:
+                    baseline = rss_bytes()
+                elif i > warmup and (i - warmup) % every == 0:
+                    samples.append(rss_bytes())
+                    print(f"{i:>10} messages  RSS {samples[-1] / 1e6:8.1f} MB  "
+                          f"{samples[-1] / 1e6 - baseline / 1e6:+7.1f} MB")
+            while metrics.queue_depth():
+                time.sleep(0.01)
+            elapsed = time.perf_counter() - started
+
+            if args.tracemalloc:
+                report = memory_profiler.report(fresh=True)
+                print("Top growth since start:")
+                for stat in report['tracemalloc']['top_since_start'][:10]:
+                    print(f"  {stat['size_diff_bytes'] / 1024:+10.1f} KiB  {stat['location']}")
+        finally:
+            pipeline.stop()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    growth = (max(samples) - baseline) / 1e6 if samples else 0.0
+    print(f"stored {metrics.stored_total} of {args.messages} messages in {elapsed:.1f}s "
+          f"({args.messages / elapsed:.0f}/s), dropped {metrics.dropped_total}")
+    print(f"RSS growth after warm-up: {growth:+.1f} MB (limit {args.max_growth_mb} MB)")
+    if growth > args.max_growth_mb:
+        print("FAIL: memory grew during the soak")
+        sys.exit(1)
+    print("OK: memory stayed flat")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Serialization benchmark - message list responses of 10k rows
+
+Fills a throwaway test database with messages (JSON payloads, half of them
+with a decoded payload) and compares building a list response with the DRF
+ModelSerializer + JSONRenderer against the values() + MessageRowSerializer
++ ORJSONRenderer path used by /api/messages/, with all fields and with
+?fields=topic,timestamp. Also times full GET requests through the view.
+
+Usage: python benchmarks/bench_serialization.py [--rows 10000] [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mqtt_django.settings')
+os.environ.setdefault('MQTT_AUTOSTART', 'False')
+
+
+def fill(rows):
+    from mqtt_service.models import MQTTMessage
+    messages = []
+    for i in range(rows):
+        data = {'device': f'dev-{i % 100}', 'temperature': 20 + i % 10 / 10,
+                'humidity': 40 + i % 7, 'status': {'battery': 90, 'rssi': -60}}
+        messages.append(MQTTMessage(
+            topic=f'sensors/{i % 100}/telemetry', payload=json.dumps(data),
+            decoded=data if i % 2 else None, qos=i % 3))
+    MQTTMessage.objects.bulk_create(messages, batch_size=1000)
+
+
+def timed(func, runs):
+    func()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        size = len(func())
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from rest_framework.renderers import JSONRenderer
+    from mqtt_service import renderers
+    from mqtt_service.models import MQTTMessage
+    from mqtt_service.serializers import MQTTMessageSerializer, MessageRowSerializer
+
+    setup_test_environment()
+    settings.ALLOWED_HOSTS = ['*']
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        fill(args.rows)
+        queryset = MQTTMessage.objects.order_by('-timestamp')
+        client = Client()
+
+        def drf(fields=None):
+            def run():
+                data = MQTTMessageSerializer(
+                    queryset[:args.rows], many=True, fields=fields).data
+                return JSONRenderer().render({'results': data})
+            return run
+
+        def fast(fields=None):
+            def run():
+                rows = MessageRowSerializer(fields)
+                data = rows.render(rows.values(queryset)[:args.rows])
+                return renderers.ORJSONRenderer().render({'results': data})
+            return run
+
+        def request(query=''):
+            def run():
+                response = client.get(
+                    f'/api/messages/?page_size={args.rows}{query}')
+                assert response.status_code == 200, response.content[:200]
+                return response.content
+            return run
+
+        cases = [
+            ('DRF serializer', drf()),
+            ('fast path', fast()),
+            ('DRF serializer, 2 fields', drf(['topic', 'timestamp'])),
+            ('fast path, 2 fields', fast(['topic', 'timestamp'])),
+            ('GET /api/messages/', request()),
+            ('GET ?fields=topic,timestamp', request('&fields=topic,timestamp')),
+        ]
+
+        encoder = 'orjson' if renderers.orjson else 'json (orjson not installed)'
+        print(f"{args.rows} rows, encoder: {encoder}")
+        print(f"{'case':<30}{'median (ms)':>13}{'size (KB)':>11}")
+        for name, func in cases:
+            elapsed, size = timed(func, args.runs)
+            print(f"{name:<30}{elapsed:>13.1f}{size / 1024:>11.0f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
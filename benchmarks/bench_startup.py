@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Startup benchmark - cold start time of a Django process
+
+Starts fresh interpreters that load the WSGI application and serve one API
+request, against a reachable, unresolvable and blackholed broker, with the
+MQTT client enabled and disabled. Cold start should be the same in every
+row: connecting happens in the background and never delays serving.
+
+Usage: python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import time
+start = time.perf_counter()
+from mqtt_django.wsgi import application
+from django.test import RequestFactory
+response = application(
+    RequestFactory().get('/api/', HTTP_HOST='localhost').environ,
+    lambda status, headers: None)
+print(time.perf_counter() - start)
+"""
+
+BROKERS = [
+    ('localhost', 'localhost'),
+    ('unresolvable', 'broker.invalid'),
+    ('blackholed', '10.255.255.1'),
+]
+
+
+def cold_start(host, autostart):
+    env = dict(os.environ,
+               DJANGO_SETTINGS_MODULE='mqtt_django.settings',
+               MQTT_BROKER_HOST=host,
+               MQTT_AUTOSTART=str(autostart))
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD], cwd=PROJECT_DIR, env=env,
+        capture_output=True, text=True, timeout=120)
+    total = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    ready = float(result.stdout.strip().splitlines()[-1])
+    return ready, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'broker':<14}{'autostart':<11}{'first response (ms)':>21}{'process (ms)':>14}")
+    for name, host in BROKERS:
+        for autostart in (False, True):
+            samples = [cold_start(host, autostart) for _ in range(args.runs)]
+            ready = statistics.median(s[0] for s in samples) * 1000
+            total = statistics.median(s[1] for s in samples) * 1000
+            print(f"{name:<14}{str(autostart):<11}{ready:>21.1f}{total:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
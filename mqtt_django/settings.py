@@ -2,6 +2,7 @@
 Django settings for mqtt_django project.
 """
 
+import json
 from pathlib import Path
 from decouple import config
 
@@ -116,6 +117,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': [
+        'mqtt_service.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # MQTT Configuration
@@ -127,6 +132,75 @@ MQTT_TOPICS = config('MQTT_TOPICS', default='mqtt/poc/',
                      cast=lambda v: [s.strip() for s in v.split(',')])
 MQTT_CLIENT_ID = config('MQTT_CLIENT_ID', default='django-mqtt-client')
 MQTT_KEEPALIVE = config('MQTT_KEEPALIVE', default=60, cast=int)
+# Set to False for API-only processes that should never connect to the broker
+MQTT_AUTOSTART = config('MQTT_AUTOSTART', default=True, cast=bool)
+MQTT_TOPIC_CACHE_TIMEOUT = config(
+    'MQTT_TOPIC_CACHE_TIMEOUT', default=300, cast=int)
+
+# Named broker connections, as a JSON list; empty uses the single broker above, e.g.
+# [{"name": "edge", "hosts": ["edge-1:1883", "edge-2:1883"], "topics": ["sensors/#"]},
+#  {"name": "cloud", "host": "xxx.hivemq.cloud", "port": 8883, "username": "...",
+#   "password": "...", "topics": ["commands/#"], "publish_topics": ["alerts/#"]}]
+# Extra hosts are standbys; publishes go to the first broker whose publish_topics match
+MQTT_BROKERS = config('MQTT_BROKERS', default='[]', cast=json.loads)
+# Seconds between checks for whether a failed-over broker's primary host is back
+MQTT_BROKER_HEALTH_INTERVAL = config(
+    'MQTT_BROKER_HEALTH_INTERVAL', default=15, cast=float)
+
+# Ingest pipeline (received messages are queued and stored in batches)
+MQTT_INGEST_QUEUE_SIZE = config(
+    'MQTT_INGEST_QUEUE_SIZE', default=10000, cast=int)
+MQTT_INGEST_BATCH_SIZE = config(
+    'MQTT_INGEST_BATCH_SIZE', default=500, cast=int)
+MQTT_INGEST_FLUSH_INTERVAL = config(
+    'MQTT_INGEST_FLUSH_INTERVAL', default=0.5, cast=float)
+# Seconds the MQTT network thread waits for room in a full queue before
+# dropping the message (backpressure on the broker connection meanwhile)
+MQTT_INGEST_BLOCK_TIMEOUT = config(
+    'MQTT_INGEST_BLOCK_TIMEOUT', default=5, cast=float)
+# Seconds shutdown waits for queued messages to be stored
+MQTT_INGEST_SHUTDOWN_TIMEOUT = config(
+    'MQTT_INGEST_SHUTDOWN_TIMEOUT', default=30, cast=float)
+
+# Per-topic ingest rate limits, as a JSON list of rules, e.g.
+# [{"topic": "mqtt/poc/#", "rate": 50, "burst": 100, "action": "sample", "sample_rate": 0.1}]
+# action is drop, sample or aggregate; per_topic=false shares one bucket per rule
+MQTT_RATE_LIMITS = config('MQTT_RATE_LIMITS', default='[]', cast=json.loads)
+
+# Windowed aggregation, as a JSON list of rules, e.g.
+# [{"topic": "mqtt/poc/+/telemetry", "window": 10, "fields": ["temp"], "raw_samples": 100}]
+# Matching topics store one summary row per window instead of raw rows
+MQTT_AGGREGATIONS = config('MQTT_AGGREGATIONS', default='[]', cast=json.loads)
+
+# Per-topic payload decoding, as a JSON list of rules, e.g.
+# [{"topic": "mqtt/poc/+/temp", "format": "json",
+#   "schema": {"type": "object", "required": ["temp"], "properties": {"temp": {"type": "number"}}}},
+#  {"topic": "mqtt/poc/+/packed", "format": "struct", "struct": "<fHI", "fields": ["temp", "hum", "seq"]}]
+# Decoded values are stored with the message; invalid payloads are quarantined
+MQTT_PAYLOAD_SCHEMAS = config(
+    'MQTT_PAYLOAD_SCHEMAS', default='[]', cast=json.loads)
+
+# Outbound forwarding of stored messages, as a JSON list of forwarders, e.g.
+# [{"name": "webhook", "type": "http", "url": "https://example.com/hook", "topics": ["mqtt/poc/#"],
+#   "batch_size": 500, "flush_interval": 1, "rate": 10, "headers": {"Authorization": "Bearer ..."}},
+#  {"name": "stream", "type": "redis", "url": "redis://localhost:6379/0", "stream": "mqtt", "maxlen": 100000},
+#  {"name": "archive", "type": "file", "path": "logs/messages.jsonl"}]
+MQTT_FORWARDERS = config('MQTT_FORWARDERS', default='[]', cast=json.loads)
+
+# Memory instrumentation of the ingest process (reported by /memoryz and manage.py memory_report)
+# tracemalloc slows allocation down; enable MQTT_MEMORY_PROFILING only while investigating
+MQTT_MEMORY_PROFILING = config('MQTT_MEMORY_PROFILING', default=False, cast=bool)
+MQTT_MEMORY_SNAPSHOT_INTERVAL = config(
+    'MQTT_MEMORY_SNAPSHOT_INTERVAL', default=300, cast=float)
+# Seconds after which the ingest writer reopens its database connection
+MQTT_DB_RECYCLE_INTERVAL = config(
+    'MQTT_DB_RECYCLE_INTERVAL', default=300, cast=float)
+
+# Readiness thresholds for /readyz
+MQTT_READY_MAX_QUEUE_DEPTH = config(
+    'MQTT_READY_MAX_QUEUE_DEPTH', default=5000, cast=int)
+MQTT_READY_MAX_WRITE_LAG = config(
+    'MQTT_READY_MAX_WRITE_LAG', default=30, cast=float)
 
 # Logging Configuration
 LOGGING = {
@@ -143,8 +217,11 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
         },
+        # Several processes (gunicorn workers, the runserver reloader) append
+        # to the same file, so rotation is left to logrotate; the handler
+        # reopens the file when it has been moved
         'file': {
-            'class': 'logging.FileHandler',
+            'class': 'logging.handlers.WatchedFileHandler',
             'filename': BASE_DIR / 'logs' / 'mqtt.log',
             'formatter': 'verbose',
         },
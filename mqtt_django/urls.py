@@ -3,8 +3,12 @@ URL configuration for mqtt_django project.
 """
 from django.contrib import admin
 from django.urls import path, include
+from mqtt_service.views import healthz, readyz, memoryz
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('mqtt_service.urls')),
+    path('healthz', healthz, name='healthz'),
+    path('readyz', readyz, name='readyz'),
+    path('memoryz', memoryz, name='memoryz'),
 ]
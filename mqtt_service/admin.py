@@ -2,15 +2,71 @@
 Django Admin Configuration for MQTT Service
 """
 from django.contrib import admin
-from .models import MQTTMessage, MQTTConnection
+from .models import (
+    MQTTMessage, MQTTMessageAggregate, QuarantinedMessage, MQTTConnection,
+    AcknowledgeJob, ReplayJob, ShedSummary,
+)
+from .pagination import EstimatedCountPaginator
+from .search import search_backend, search_messages
+from .topics import distinct_topics
+
+
+class TopicListFilter(admin.SimpleListFilter):
+    """Topic filter fed from the cached topic list instead of SELECT DISTINCT"""
+    title = 'topic'
+    parameter_name = 'topic'
+
+    def lookups(self, request, model_admin):
+        return [(topic, topic) for topic in distinct_topics()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(topic=self.value())
+        return queryset
 
 
 @admin.register(MQTTMessage)
 class MQTTMessageAdmin(admin.ModelAdmin):
     list_display = ('topic', 'timestamp', 'processed', 'qos')
-    list_filter = ('topic', 'processed', 'timestamp')
+    list_filter = (TopicListFilter, 'processed', 'timestamp')
     search_fields = ('topic', 'payload')
     readonly_fields = ('timestamp',)
+    date_hierarchy = 'timestamp'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search through the full-text index instead of LIKE scans. Databases
+        without a search index only get an indexed topic prefix match.
+        """
+        if search_backend(queryset) == 'fallback':
+            return queryset.filter(topic__startswith=search_term.strip()), False
+        return search_messages(queryset, search_term), False
+
+
+@admin.register(QuarantinedMessage)
+class QuarantinedMessageAdmin(admin.ModelAdmin):
+    list_display = ('topic', 'schema_topic', 'error', 'timestamp')
+    list_filter = ('schema_topic', 'timestamp')
+    search_fields = ('=topic',)
+    readonly_fields = ('timestamp',)
+
+
+@admin.register(ShedSummary)
+class ShedSummaryAdmin(admin.ModelAdmin):
+    list_display = ('topic', 'rule_topic', 'count', 'timestamp')
+    list_filter = ('rule_topic', 'timestamp')
+    search_fields = ('=topic',)
+    readonly_fields = ('timestamp',)
+
+
+@admin.register(MQTTMessageAggregate)
+class MQTTMessageAggregateAdmin(admin.ModelAdmin):
+    list_display = ('topic', 'window_start', 'window_end', 'count')
+    list_filter = ('window_start',)
+    search_fields = ('=topic',)
+    date_hierarchy = 'window_start'
 
 
 @admin.register(MQTTConnection)
@@ -19,3 +75,20 @@ class MQTTConnectionAdmin(admin.ModelAdmin):
     list_filter = ('status', 'updated_at')
     search_fields = ('client_id',)
     readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(AcknowledgeJob)
+class AcknowledgeJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'updated_count',
+                    'total_count', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'updated_at', 'finished_at')
+
+
+@admin.register(ReplayJob)
+class ReplayJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic_filter', 'mode', 'status',
+                    'published_count', 'created_at', 'finished_at')
+    list_filter = ('status', 'mode')
+    readonly_fields = ('last_id', 'published_count',
+                       'created_at', 'updated_at', 'finished_at')
@@ -0,0 +1,192 @@
+"""
+Windowed aggregation of high-frequency telemetry topics
+
+Topics matching a rule in ``MQTT_AGGREGATIONS`` are not stored as raw rows.
+Numeric JSON fields are buffered per tumbling window in ``array('d')``
+buffers and one MQTTMessageAggregate row (count/min/max/mean/last per field)
+is stored when the window closes. The most recent raw samples can be kept
+in a per-topic in-memory ring buffer.
+
+The aggregator is only used from the ingest writer thread, so it needs no
+locks; ring buffers are deques, which are safe to read from other threads.
+"""
+import json
+import math
+from array import array
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .models import MQTTMessageAggregate
+from .topics import TopicRuleCache, validate_topic_filter
+
+
+class AggregationRule:
+    """One entry of MQTT_AGGREGATIONS"""
+    __slots__ = ('topic', 'window', 'fields', 'raw_samples')
+
+    def __init__(self, topic, window=10, fields=None, raw_samples=0):
+        try:
+            validate_topic_filter(topic)
+        except Exception:
+            raise ImproperlyConfigured(
+                f"MQTT_AGGREGATIONS: invalid topic filter {topic!r}")
+        if window <= 0:
+            raise ImproperlyConfigured("MQTT_AGGREGATIONS: window must be > 0")
+        self.topic = topic
+        self.window = window
+        self.fields = frozenset(fields) if fields else None
+        self.raw_samples = raw_samples
+
+
+class TopicWindow:
+    """Buffers of the currently open window of one topic"""
+    __slots__ = ('rule', 'start', 'end', 'count', 'values', 'last')
+
+    def __init__(self, rule, start):
+        self.rule = rule
+        self.start = start
+        self.end = start + rule.window
+        self.count = 0
+        self.values = {}
+        self.last = {}
+
+    def add(self, numbers):
+        self.count += 1
+        for name, value in numbers.items():
+            buffer = self.values.get(name)
+            if buffer is None:
+                buffer = self.values[name] = array('d')
+            buffer.append(value)
+            self.last[name] = value
+
+    def summary(self, topic):
+        fields = {}
+        for name, buffer in self.values.items():
+            try:
+                mean = math.fsum(buffer) / len(buffer)
+            except OverflowError:
+                # The sum of values near the float limit overflows; the mean doesn't
+                mean = math.fsum(value / len(buffer) for value in buffer)
+            fields[name] = {
+                'count': len(buffer),
+                'min': min(buffer),
+                'max': max(buffer),
+                'mean': mean,
+                'last': self.last[name],
+            }
+        return MQTTMessageAggregate(
+            topic=topic,
+            window_start=datetime.fromtimestamp(self.start, dt_timezone.utc),
+            window_end=datetime.fromtimestamp(self.end, dt_timezone.utc),
+            count=self.count,
+            fields=fields,
+        )
+
+
+def numeric_fields(data, prefix=''):
+    """
+    Flatten numeric values of a decoded JSON object into dotted field names.
+    Values that don't fit a finite float (huge integers, NaN, Infinity) are
+    skipped.
+    """
+    numbers = {}
+    for key, value in data.items():
+        name = prefix + key
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)):
+            try:
+                number = float(value)
+            except OverflowError:
+                continue
+            if math.isfinite(number):
+                numbers[name] = number
+        elif isinstance(value, dict):
+            numbers.update(numeric_fields(value, name + '.'))
+    return numbers
+
+
+class WindowAggregator:
+    """Tumbling-window aggregator for topics configured in MQTT_AGGREGATIONS"""
+
+    def __init__(self, rules=None):
+        rules = settings.MQTT_AGGREGATIONS if rules is None else rules
+        self.rules = [AggregationRule(**rule) for rule in rules]
+        self.enabled = bool(self.rules)
+        self._topics = TopicRuleCache((rule.topic, rule) for rule in self.rules)
+        self._windows = {}
+        self._recent = {}
+        self._next_close = math.inf
+
+    def rule_for(self, topic):
+        """Return the aggregation rule for a topic, or None"""
+        return self._topics.get(topic)
+
+    def add(self, topic, payload, received_at):
+        """
+        Add a message received at ``received_at`` (epoch seconds).
+
+        Returns False when the topic is not aggregated or the payload is not
+        a JSON object (or is nested too deeply to flatten), in which case the
+        caller stores the raw message. Returns a list of closed-window
+        summaries otherwise (possibly empty).
+        """
+        rule = self.rule_for(topic)
+        if rule is None:
+            return False
+        try:
+            data = json.loads(payload)
+            if not isinstance(data, dict):
+                return False
+            numbers = numeric_fields(data)
+        except (ValueError, RecursionError):
+            return False
+        if rule.fields is not None:
+            numbers = {name: value for name, value in numbers.items()
+                       if name in rule.fields}
+
+        closed = []
+        start = received_at - received_at % rule.window
+        window = self._windows.get(topic)
+        if window is not None and window.start != start:
+            closed.append(window.summary(topic))
+            window = None
+        if window is None:
+            window = self._windows[topic] = TopicWindow(rule, start)
+            self._next_close = min(self._next_close, window.end)
+        window.add(numbers)
+
+        if rule.raw_samples:
+            recent = self._recent.get(topic)
+            if recent is None:
+                recent = self._recent[topic] = deque(maxlen=rule.raw_samples)
+            recent.append((received_at, payload.decode('utf-8', 'replace')))
+        return closed
+
+    def close_windows(self, now, force=False):
+        """Return summaries of windows that ended before ``now`` (all if ``force``)"""
+        if not force and now < self._next_close:
+            return []
+        closed = []
+        for topic, window in list(self._windows.items()):
+            if force or window.end <= now:
+                closed.append(window.summary(topic))
+                del self._windows[topic]
+        self._next_close = min(
+            (window.end for window in self._windows.values()), default=math.inf)
+        return closed
+
+    def recent_samples(self, topic):
+        """Return the raw samples kept in the ring buffer of a topic"""
+        recent = self._recent.get(topic)
+        if recent is None:
+            return []
+        return [
+            {'received_at': datetime.fromtimestamp(received_at, dt_timezone.utc),
+             'payload': payload}
+            for received_at, payload in list(recent)
+        ]
+
+
+aggregator = WindowAggregator()
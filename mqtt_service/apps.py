@@ -1,7 +1,33 @@
 """
 Apps Configuration for MQTT Service
 """
+import sys
 from django.apps import AppConfig
+from django.conf import settings
+
+# Management commands that never need the subscribing broker connection
+NO_MQTT_COMMANDS = {
+    'changepassword', 'check', 'collectstatic', 'create_test_admin',
+    'createsuperuser', 'dbshell', 'makemigrations', 'memory_report', 'migrate',
+    'replay_messages', 'shell', 'showmigrations', 'sqlmigrate', 'test',
+}
+
+
+def mqtt_enabled():
+    """
+    Return True if this process should run the MQTT client. Management
+    commands in NO_MQTT_COMMANDS are recognized whatever the entry point
+    (manage.py, django-admin, python -m django), and test runs under pytest
+    never connect.
+    """
+    if not settings.MQTT_AUTOSTART:
+        return False
+    if 'pytest' in sys.modules:
+        return False
+    argv = sys.argv
+    if len(argv) > 1 and argv[1] in NO_MQTT_COMMANDS:
+        return False
+    return True
 
 
 class MqttServiceConfig(AppConfig):
@@ -10,11 +36,20 @@ class MqttServiceConfig(AppConfig):
     verbose_name = 'MQTT Service'
 
     def ready(self):
-        """Initialize MQTT client when app is ready"""
+        """
+        Start the MQTT client in the background when app is ready.
+
+        Nothing MQTT related (including paho) is imported for processes that
+        don't run the client, e.g. migrations or API-only workers started
+        with MQTT_AUTOSTART=False.
+        """
+        if not mqtt_enabled():
+            return
+
         from .mqtt_client import MQTTClientManager
         import atexit
 
-        # Initialize MQTT client
+        # Initialize MQTT client; connecting happens on the network thread
         MQTTClientManager.initialize()
 
         # Register cleanup on shutdown
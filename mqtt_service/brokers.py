@@ -0,0 +1,90 @@
+"""
+Broker connection settings
+
+``MQTT_BROKERS`` lists named broker connections, each with its own hosts,
+subscriptions, credentials and TLS settings. When it is empty a single
+broker named ``default`` is built from MQTT_BROKER_HOST, MQTT_BROKER_PORT,
+MQTT_USERNAME, MQTT_PASSWORD and MQTT_TOPICS.
+
+A broker with several hosts runs active/standby: the first host is the
+primary, the others are tried in order after ``failover_after`` failed
+connection attempts.
+"""
+import socket
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .topics import validate_topic_filter
+
+DEFAULT_BROKER = 'default'
+TLS_PORT = 8883
+
+
+def parse_host(value, default_port=1883):
+    """Parse ``"host:port"``, ``"host"`` or ``[host, port]`` into (host, port)"""
+    if isinstance(value, (list, tuple)):
+        host, port = value
+    else:
+        host, _, port = str(value).rpartition(':')
+        if not host or not port.isdigit():
+            host, port = value, default_port
+    return host, int(port)
+
+
+class BrokerConfig:
+    """One entry of MQTT_BROKERS"""
+    __slots__ = ('name', 'hosts', 'topics', 'publish_topics', 'username',
+                 'password', 'tls', 'keepalive', 'client_id', 'failover_after')
+
+    def __init__(self, name, host=None, port=1883, hosts=None, topics=(),
+                 publish_topics=(), username='', password='', tls=None,
+                 keepalive=None, client_id=None, failover_after=3):
+        hosts = hosts or ([host] if host else [])
+        if not hosts:
+            raise ImproperlyConfigured(f"MQTT_BROKERS: broker {name!r} has no hosts")
+        for topic in list(topics) + list(publish_topics):
+            try:
+                validate_topic_filter(topic)
+            except Exception:
+                raise ImproperlyConfigured(
+                    f"MQTT_BROKERS: invalid topic filter {topic!r} for broker {name!r}")
+        self.name = name
+        self.hosts = [parse_host(value, port) for value in hosts]
+        self.topics = list(topics)
+        self.publish_topics = list(publish_topics)
+        self.username = username
+        self.password = password
+        if tls is None:
+            tls = self.hosts[0][1] == TLS_PORT
+        # tls is True/False or a dict of ca_certs, certfile, keyfile, insecure
+        self.tls = (tls if isinstance(tls, dict) else {}) if tls else None
+        self.keepalive = keepalive or settings.MQTT_KEEPALIVE
+        self.client_id = client_id
+        self.failover_after = max(1, failover_after)
+
+
+def load_brokers(brokers=None):
+    """Return the BrokerConfig list for MQTT_BROKERS (or the single default broker)"""
+    brokers = settings.MQTT_BROKERS if brokers is None else brokers
+    if not brokers:
+        brokers = [{
+            'name': DEFAULT_BROKER,
+            'host': settings.MQTT_BROKER_HOST,
+            'port': settings.MQTT_BROKER_PORT,
+            'topics': settings.MQTT_TOPICS,
+            'username': settings.MQTT_USERNAME,
+            'password': settings.MQTT_PASSWORD,
+        }]
+    configs = [BrokerConfig(**broker) for broker in brokers]
+    names = [config.name for config in configs]
+    if len(set(names)) != len(names):
+        raise ImproperlyConfigured("MQTT_BROKERS: broker names must be unique")
+    return configs
+
+
+def probe(host, port, timeout=3):
+    """Return True if a TCP connection to host:port can be opened"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
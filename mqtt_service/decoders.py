@@ -0,0 +1,265 @@
+"""
+Per-topic payload decoding and validation
+
+``MQTT_PAYLOAD_SCHEMAS`` assigns a payload format and an optional schema to
+topic filters. Each rule is compiled once into a decoder closure, and each
+schema into a tree of validator closures, so ingest only runs
+pre-built functions per message. Supported formats:
+
+- ``json``: UTF-8 JSON text
+- ``struct``: fixed binary layout, e.g. ``{"struct": "<fHI", "fields": [...]}``
+- ``msgpack`` / ``cbor``: need the optional ``msgpack`` / ``cbor2`` packages
+
+Schemas use a JSON Schema subset: ``type``, ``properties``, ``required``,
+``additionalProperties`` (boolean), ``items``, ``enum``, ``minimum``,
+``maximum``, ``minLength`` and ``maxLength``.
+
+Decoded values are stored in a JSON column, so NaN, infinities and values
+JSON can't represent are rejected as payload errors, as is any other
+exception raised while decoding.
+"""
+import json
+import math
+import struct
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .topics import TopicRuleCache, validate_topic_filter
+
+TYPE_CHECKS = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None,
+}
+
+
+class PayloadError(ValueError):
+    """Raised when a payload can't be decoded or fails its schema"""
+
+
+JSON_KEY_TYPES = (str, int, float, bool, type(None))
+
+
+def parse_json_constant(name):
+    raise PayloadError(f"Invalid JSON: {name} is not a finite number")
+
+
+def parse_json_float(text):
+    value = float(text)
+    if not math.isfinite(value):
+        raise PayloadError(f"Invalid JSON: {text} is out of range")
+    return value
+
+
+def check_json_value(value):
+    """Raise PayloadError if a decoded value can't be stored as JSON"""
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise PayloadError(f"{value} is not a finite number")
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if not isinstance(key, JSON_KEY_TYPES):
+                raise PayloadError(f"Map key of type {type(key).__name__} is not valid JSON")
+            check_json_value(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            check_json_value(item)
+    elif not isinstance(value, (str, int, bool, type(None))):
+        raise PayloadError(f"Value of type {type(value).__name__} is not valid JSON")
+
+
+def compile_schema(schema, path='$'):
+    """Compile a JSON Schema subset into a validator ``f(value)``"""
+    checks = []
+
+    if 'type' in schema:
+        types = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+        try:
+            type_checks = [TYPE_CHECKS[name] for name in types]
+        except KeyError as e:
+            raise ImproperlyConfigured(f"Unsupported schema type {e} at {path}")
+        expected = ' or '.join(types)
+
+        def check_type(value):
+            if not any(check(value) for check in type_checks):
+                raise PayloadError(f"{path}: expected {expected}")
+        checks.append(check_type)
+
+    if 'enum' in schema:
+        allowed = schema['enum']
+
+        def check_enum(value):
+            if value not in allowed:
+                raise PayloadError(f"{path}: {value!r} is not one of {allowed!r}")
+        checks.append(check_enum)
+
+    for key, compare, message in (('minimum', float.__lt__, 'less than'),
+                                  ('maximum', float.__gt__, 'greater than')):
+        if key in schema:
+            def check_bound(value, limit=float(schema[key]), compare=compare, message=message):
+                if TYPE_CHECKS['number'](value) and compare(float(value), limit):
+                    raise PayloadError(f"{path}: {value} is {message} {limit:g}")
+            checks.append(check_bound)
+
+    if 'minLength' in schema or 'maxLength' in schema:
+        min_length = schema.get('minLength', 0)
+        max_length = schema.get('maxLength')
+
+        def check_length(value):
+            if isinstance(value, str) and (
+                    len(value) < min_length or
+                    (max_length is not None and len(value) > max_length)):
+                raise PayloadError(f"{path}: string length {len(value)} out of range")
+        checks.append(check_length)
+
+    if 'properties' in schema or 'required' in schema or \
+            schema.get('additionalProperties') is False:
+        properties = {name: compile_schema(sub, f"{path}.{name}")
+                      for name, sub in schema.get('properties', {}).items()}
+        required = list(schema.get('required', []))
+        closed = schema.get('additionalProperties') is False
+
+        def check_object(value):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    raise PayloadError(f"{path}: missing required property {name!r}")
+            for name, item in value.items():
+                validator = properties.get(name)
+                if validator is not None:
+                    validator(item)
+                elif closed:
+                    raise PayloadError(f"{path}: unexpected property {name!r}")
+        checks.append(check_object)
+
+    if 'items' in schema:
+        item_validator = compile_schema(schema['items'], f"{path}[]")
+
+        def check_items(value):
+            if isinstance(value, list):
+                for item in value:
+                    item_validator(item)
+        checks.append(check_items)
+
+    if not checks:
+        return lambda value: None
+    if len(checks) == 1:
+        return checks[0]
+
+    def validate(value):
+        for check in checks:
+            check(value)
+    return validate
+
+
+def _load_optional(module_name, format_name):
+    try:
+        return __import__(module_name)
+    except ImportError:
+        raise ImproperlyConfigured(
+            f"Payload format '{format_name}' requires the '{module_name}' package")
+
+
+def compile_decoder(rule):
+    """Compile one MQTT_PAYLOAD_SCHEMAS rule into a decoder ``f(bytes) -> value``"""
+    payload_format = rule.get('format', 'json')
+
+    if payload_format == 'json':
+        def parse(payload):
+            try:
+                return json.loads(payload, parse_constant=parse_json_constant,
+                                  parse_float=parse_json_float)
+            except PayloadError:
+                raise
+            except ValueError as e:
+                raise PayloadError(f"Invalid JSON: {e}")
+
+    elif payload_format == 'struct':
+        try:
+            layout = struct.Struct(rule['struct'])
+        except (KeyError, struct.error) as e:
+            raise ImproperlyConfigured(f"Invalid struct format for {rule.get('topic')}: {e}")
+        fields = rule.get('fields')
+        if fields and len(fields) != len(layout.unpack(bytes(layout.size))):
+            raise ImproperlyConfigured(
+                f"Struct fields don't match format for {rule.get('topic')}")
+
+        def parse(payload):
+            try:
+                values = layout.unpack(payload)
+            except struct.error as e:
+                raise PayloadError(f"Invalid struct payload: {e}")
+            values = [value.decode('utf-8', 'replace') if isinstance(value, bytes)
+                      else value for value in values]
+            for value in values:
+                if isinstance(value, float) and not math.isfinite(value):
+                    raise PayloadError(f"Invalid struct payload: {value} is not a finite number")
+            return dict(zip(fields, values)) if fields else values
+
+    elif payload_format == 'msgpack':
+        msgpack = _load_optional('msgpack', payload_format)
+
+        def parse(payload):
+            try:
+                value = msgpack.unpackb(payload, raw=False)
+            except Exception as e:
+                raise PayloadError(f"Invalid MessagePack payload: {e}")
+            check_json_value(value)
+            return value
+
+    elif payload_format == 'cbor':
+        cbor2 = _load_optional('cbor2', payload_format)
+
+        def parse(payload):
+            try:
+                value = cbor2.loads(payload)
+            except Exception as e:
+                raise PayloadError(f"Invalid CBOR payload: {e}")
+            check_json_value(value)
+            return value
+
+    else:
+        raise ImproperlyConfigured(f"Unsupported payload format '{payload_format}'")
+
+    validate = compile_schema(rule['schema']) if 'schema' in rule else None
+
+    def decode(payload):
+        try:
+            value = parse(payload)
+            if validate is not None:
+                validate(value)
+        except PayloadError:
+            raise
+        except Exception as e:
+            # e.g. RecursionError on deeply nested payloads
+            raise PayloadError(f"Could not decode payload: {e!r}")
+        return value
+    return decode
+
+
+class PayloadDecoder:
+    """Decoders for every topic filter configured in MQTT_PAYLOAD_SCHEMAS"""
+
+    def __init__(self, rules=None):
+        rules = settings.MQTT_PAYLOAD_SCHEMAS if rules is None else rules
+        self.rules = []
+        for rule in rules:
+            try:
+                validate_topic_filter(rule['topic'])
+            except Exception:
+                raise ImproperlyConfigured(
+                    f"MQTT_PAYLOAD_SCHEMAS: invalid topic filter {rule.get('topic')!r}")
+            self.rules.append((rule['topic'], compile_decoder(rule)))
+        self.enabled = bool(self.rules)
+        self._topics = TopicRuleCache((rule[0], rule) for rule in self.rules)
+
+    def rule_for(self, topic):
+        """Return (topic filter, decoder) for a topic, or None"""
+        return self._topics.get(topic)
+
+
+payload_decoder = PayloadDecoder()
@@ -0,0 +1,59 @@
+"""
+Filter backends for MQTT Service API
+"""
+import django_filters
+from django.db import connections
+from rest_framework import filters
+from .models import MQTTMessage
+from .search import search_messages
+from .topics import topic_filter_q, validate_topic_filter
+
+
+class MessageSearchFilter(filters.SearchFilter):
+    """
+    Full-text search over topic and payload backed by the search index.
+
+    ``?search=`` matches words in topic or payload, ``?topic_prefix=``
+    restricts results to topics starting with the given string.
+    """
+    topic_prefix_param = 'topic_prefix'
+
+    def get_search_term(self, request):
+        return ' '.join(self.get_search_terms(request))
+
+    def filter_queryset(self, request, queryset, view):
+        return search_messages(
+            queryset,
+            self.get_search_term(request),
+            topic_prefix=request.query_params.get(self.topic_prefix_param),
+        )
+
+
+class MessageOrderingFilter(filters.OrderingFilter):
+    """Ordering filter that sorts search results by relevance by default"""
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param):
+            query = queryset.query
+            if 'search_rank' in query.extra_select or 'search_rank' in query.annotations:
+                return ['search_rank', '-timestamp']
+        return super().get_ordering(request, queryset, view)
+
+
+class MQTTMessageFilter(django_filters.FilterSet):
+    """
+    Message filters, including MQTT wildcard topic filters.
+
+    ``?topic_filter=mqtt/poc/+/temp`` matches topics the same way a broker
+    subscription would.
+    """
+    topic_filter = django_filters.CharFilter(
+        method='filter_topic_filter', validators=[validate_topic_filter])
+
+    class Meta:
+        model = MQTTMessage
+        fields = ['topic', 'processed']
+
+    def filter_topic_filter(self, queryset, name, value):
+        return queryset.filter(
+            topic_filter_q(value, connections[queryset.db].vendor))
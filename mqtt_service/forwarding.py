@@ -0,0 +1,318 @@
+"""
+Outbound forwarding of ingested messages
+
+``MQTT_FORWARDERS`` pushes stored messages whose topic matches a forwarder's
+topic filters to a sink, so downstream systems don't have to poll the API:
+
+- ``http``: POST a JSON array per batch to a webhook, over one keep-alive
+  connection, gzip-compressed unless ``"gzip": false``
+- ``redis``: XADD each message to a Redis stream, one pipeline per batch
+- ``file``: append JSON lines to a local file
+
+Each forwarder has its own bounded queue and delivery thread; the ingest
+writer only enqueues, so a slow or failing sink never delays storage or the
+other sinks. Batches are sent every ``batch_size`` messages or
+``flush_interval`` seconds, limited to ``rate`` deliveries per second, and
+retried with jittered exponential backoff up to ``max_retries`` times
+before they are dropped.
+"""
+import collections
+import gzip
+import http.client
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .ratelimit import TokenBucket
+from .renderers import dumps
+from .topics import TopicRuleCache, validate_topic_filter
+
+logger = logging.getLogger('mqtt_service')
+
+MAX_BACKOFF = 30
+
+
+class DeliveryError(Exception):
+    """Raised by a sink when a batch could not be delivered"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class HTTPSink:
+    """POST batches to a webhook over a persistent HTTP/1.1 connection"""
+
+    def __init__(self, url, headers=None, gzip=True, timeout=10):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ImproperlyConfigured(f"MQTT_FORWARDERS: invalid webhook URL {url!r}")
+        self.url = url
+        self.connection_class = http.client.HTTPSConnection \
+            if parts.scheme == 'https' else http.client.HTTPConnection
+        self.address = (parts.hostname, parts.port)
+        self.path = parts.path or '/'
+        if parts.query:
+            self.path += '?' + parts.query
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        if gzip:
+            self.headers['Content-Encoding'] = 'gzip'
+        self.gzip = gzip
+        self.timeout = timeout
+        self._connection = None
+
+    def deliver(self, records):
+        body = b'[' + b','.join(records) + b']'
+        if self.gzip:
+            body = gzip.compress(body, compresslevel=5)
+
+        if self._connection is None:
+            self._connection = self.connection_class(*self.address, timeout=self.timeout)
+        try:
+            self._connection.request('POST', self.path, body, self.headers)
+            response = self._connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError) as e:
+            self.close()
+            raise DeliveryError(f"{self.url}: {e}")
+        if response.will_close:
+            self.close()
+
+        if response.status >= 300:
+            retryable = response.status == 429 or response.status >= 500
+            raise DeliveryError(f"{self.url}: HTTP {response.status}", retryable)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class RedisStreamSink:
+    """XADD messages to a Redis stream, one pipeline round trip per batch"""
+
+    def __init__(self, stream, url='redis://localhost:6379/0', maxlen=None):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured(
+                "Redis stream forwarding requires the 'redis' package")
+        self.errors = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+        self.client = redis.Redis.from_url(url)
+        self.stream = stream
+        self.maxlen = maxlen
+
+    def deliver(self, records):
+        pipeline = self.client.pipeline(transaction=False)
+        for record in records:
+            pipeline.xadd(self.stream, {'message': record},
+                          maxlen=self.maxlen, approximate=True)
+        try:
+            pipeline.execute()
+        except self.errors as e:
+            raise DeliveryError(f"redis stream {self.stream}: {e}")
+
+    def close(self):
+        self.client.close()
+
+
+class FileSink:
+    """Append messages as JSON lines to a local file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def deliver(self, records):
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'ab')
+            self._file.write(b'\n'.join(records) + b'\n')
+            self._file.flush()
+        except OSError as e:
+            self.close()
+            raise DeliveryError(f"{self.path}: {e}")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+SINKS = {
+    'http': HTTPSink,
+    'redis': RedisStreamSink,
+    'file': FileSink,
+}
+
+
+def message_record(message):
+    """Encode a stored MQTTMessage in the same shape as the messages API"""
+    return dumps({
+        'id': message.id,
+        'topic': message.topic,
+        'payload': message.payload,
+        'decoded': message.decoded,
+        'qos': message.qos,
+        'retain': message.retain,
+        'timestamp': message.timestamp,
+        'processed': message.processed,
+    })
+
+
+class Forwarder:
+    """One entry of MQTT_FORWARDERS: a sink with its own queue and delivery thread"""
+
+    def __init__(self, name, type, topics=('#',), batch_size=500, flush_interval=1.0,
+                 queue_size=10000, rate=None, burst=None, max_retries=5, **options):
+        if type not in SINKS:
+            raise ImproperlyConfigured(
+                f"MQTT_FORWARDERS: type must be one of {', '.join(SINKS)}")
+        for topic in topics:
+            try:
+                validate_topic_filter(topic)
+            except Exception:
+                raise ImproperlyConfigured(
+                    f"MQTT_FORWARDERS: invalid topic filter {topic!r} for {name!r}")
+        try:
+            self.sink = SINKS[type](**options)
+        except TypeError as e:
+            raise ImproperlyConfigured(f"MQTT_FORWARDERS: {name!r}: {e}")
+        self.name = name
+        self.topics = list(topics)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(float(rate), float(burst or rate)) if rate else None
+        self.stats = {'queued': 0, 'delivered': 0, 'dropped': 0, 'failed': 0,
+                      'retries': 0, 'batches': 0, 'last_error': None}
+        self._topics = TopicRuleCache(
+            ((topic_filter, True) for topic_filter in self.topics), default=False)
+        self._pending = collections.deque()
+        self._condition = threading.Condition()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def matches(self, topic):
+        return self._topics.get(topic)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f'mqtt-forward-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Deliver what is queued (without retrying) and stop the delivery thread"""
+        self._stopping.set()
+        with self._condition:
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.sink.close()
+
+    def submit(self, records):
+        """Queue encoded messages; drops what doesn't fit in the queue"""
+        with self._condition:
+            room = self.queue_size - len(self._pending)
+            if room < len(records):
+                self.stats['dropped'] += len(records) - max(room, 0)
+                records = records[:max(room, 0)]
+            self._pending.extend(records)
+            self.stats['queued'] += len(records)
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def _next_batch(self):
+        """Wait for a full batch or flush_interval, then take up to batch_size messages"""
+        deadline = time.monotonic() + self.flush_interval
+        with self._condition:
+            while len(self._pending) < self.batch_size and not self._stopping.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            count = min(len(self._pending), self.batch_size)
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _run(self):
+        while not self._stopping.is_set() or self._pending:
+            batch = self._next_batch()
+            if batch:
+                self.deliver(batch)
+
+    def _wait_for_token(self):
+        while not self.bucket.consume(time.monotonic()):
+            if self._stopping.wait(1 / self.bucket.rate):
+                return
+
+    def deliver(self, batch):
+        """Deliver one batch, retrying with backoff; returns True on success"""
+        attempt = 0
+        while True:
+            if self.bucket:
+                self._wait_for_token()
+            try:
+                self.sink.deliver(batch)
+                self.stats['delivered'] += len(batch)
+                self.stats['batches'] += 1
+                return True
+            except DeliveryError as e:
+                self.stats['last_error'] = str(e)
+                if not e.retryable or attempt >= self.max_retries or self._stopping.is_set():
+                    self.stats['failed'] += len(batch)
+                    logger.error(
+                        f"Forwarder {self.name}: dropped {len(batch)} messages: {e}")
+                    return False
+                attempt += 1
+                self.stats['retries'] += 1
+                delay = min(0.5 * 2 ** (attempt - 1), MAX_BACKOFF)
+                logger.warning(f"Forwarder {self.name}: {e}, retrying in up to {delay:g}s")
+                self._stopping.wait(random.uniform(delay / 2, delay))
+
+    def snapshot(self):
+        return {**self.stats, 'queue_depth': len(self._pending)}
+
+
+class ForwardingStage:
+    """Forwarders configured in MQTT_FORWARDERS, fed by the ingest writer"""
+
+    def __init__(self, forwarders=None):
+        forwarders = settings.MQTT_FORWARDERS if forwarders is None else forwarders
+        self.forwarders = [Forwarder(**forwarder) for forwarder in forwarders]
+        self.enabled = bool(self.forwarders)
+
+    def start(self):
+        for forwarder in self.forwarders:
+            forwarder.start()
+
+    def stop(self, timeout=5):
+        for forwarder in self.forwarders:
+            forwarder.stop(timeout)
+
+    def forward(self, messages):
+        """Queue stored messages for every forwarder whose topics match"""
+        encoded = {}
+        for forwarder in self.forwarders:
+            records = []
+            for message in messages:
+                if forwarder.matches(message.topic):
+                    record = encoded.get(id(message))
+                    if record is None:
+                        record = encoded[id(message)] = message_record(message)
+                    records.append(record)
+            if records:
+                forwarder.submit(records)
+
+    def snapshot(self):
+        return {forwarder.name: forwarder.snapshot() for forwarder in self.forwarders}
+
+
+forwarding = ForwardingStage()
@@ -0,0 +1,285 @@
+"""
+Ingest pipeline between the MQTT network thread and the database
+
+The network thread only enqueues received messages; a writer thread drains
+the queue and stores messages in batches with ``bulk_create``. This keeps
+database latency off the network thread and turns one INSERT per message
+into one INSERT per batch.
+
+The trade-off is at-most-once storage: paho acknowledges QoS 1/2 messages
+when they are queued, not when they are committed, so queued messages are
+lost if the process crashes. When the queue is full the network thread
+blocks for up to MQTT_INGEST_BLOCK_TIMEOUT seconds, which stops reading
+from the broker connection, before the message is dropped and counted.
+Shutdown stores what is queued, for up to MQTT_INGEST_SHUTDOWN_TIMEOUT
+seconds. Topics configured for windowed aggregation are
+summarized by the writer thread instead of being stored raw, and payloads of
+topics with a schema are decoded once here rather than on every read.
+Stored messages are handed to the forwarding stage for outbound delivery.
+"""
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import DataError, IntegrityError, connection, transaction
+from .metrics import metrics
+from .aggregation import aggregator
+from .decoders import PayloadError, payload_decoder
+from .forwarding import forwarding
+from .memory import guard, memory_profiler
+from .models import MQTTMessage, MQTTMessageAggregate, QuarantinedMessage, ShedSummary
+from .ratelimit import rate_limiter
+
+logger = logging.getLogger('mqtt_service')
+
+
+class IngestPipeline:
+    """Singleton queue and batch writer for received MQTT messages"""
+
+    _instance = None
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=settings.MQTT_INGEST_QUEUE_SIZE)
+        self._thread = None
+        self._stopping = threading.Event()
+        metrics.bind_queue(self._queue.qsize, self._oldest_pending, self.writer_stopped)
+
+    @classmethod
+    def get_instance(cls):
+        """Get ingest pipeline instance"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def start(self):
+        """Start the writer thread if it is not running"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        if forwarding.enabled:
+            forwarding.start()
+        memory_profiler.start()
+        self._thread = threading.Thread(
+            target=self._run, name='mqtt-ingest-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Flush queued messages and stop the writer thread"""
+        if timeout is None:
+            timeout = settings.MQTT_INGEST_SHUTDOWN_TIMEOUT
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.error(f"Ingest writer did not finish within {timeout:g}s, "
+                             f"{self._queue.qsize()} queued messages not stored")
+            self._thread = None
+        if forwarding.enabled:
+            forwarding.stop()
+        memory_profiler.stop()
+
+    def submit(self, topic, payload, qos, retain):
+        """
+        Queue a received message for storage; called on the network thread.
+        Blocks up to MQTT_INGEST_BLOCK_TIMEOUT seconds while the queue is full.
+        """
+        item = (topic, payload, qos, retain, time.monotonic())
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        try:
+            self._queue.put(item, timeout=settings.MQTT_INGEST_BLOCK_TIMEOUT)
+        except queue.Full:
+            metrics.record_dropped()
+            if metrics.dropped_total % 1000 == 1:
+                logger.warning(
+                    f"Ingest queue full, dropped {metrics.dropped_total} messages so far")
+
+    def _oldest_pending(self):
+        with self._queue.mutex:
+            return self._queue.queue[0][4] if self._queue.queue else None
+
+    def _next_batch(self):
+        """Wait for messages and collect up to MQTT_INGEST_BATCH_SIZE of them"""
+        try:
+            batch = [self._queue.get(timeout=settings.MQTT_INGEST_FLUSH_INTERVAL)]
+        except queue.Empty:
+            return []
+        while len(batch) < settings.MQTT_INGEST_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def writer_stopped(self):
+        """Return True if the writer thread was started and is no longer running"""
+        return self._thread is not None and not self._thread.is_alive()
+
+    def _run(self):
+        next_flush = time.monotonic() + 1
+        try:
+            while not (self._stopping.is_set() and self._queue.empty()):
+                batch = []
+                # An unexpected error loses at most the current batch; the
+                # writer thread itself must keep draining the queue
+                try:
+                    batch = self._next_batch()
+                    if batch:
+                        self.write_batch(batch)
+                        guard.tick()
+                    if aggregator.enabled:
+                        self.flush_aggregates()
+                    if time.monotonic() >= next_flush:
+                        self.flush_rate_limited()
+                        next_flush = time.monotonic() + 1
+                except Exception as e:
+                    metrics.record_write_error(len(batch))
+                    logger.exception(f"Ingest writer error, {len(batch)} messages lost: {e}")
+                    connection.close_if_unusable_or_obsolete()
+            self.flush_rate_limited()
+            self.flush_aggregates(force=True)
+        finally:
+            connection.close()
+
+    def flush_rate_limited(self):
+        """Store summary rows for messages shed by aggregate rate limits"""
+        self.write_summaries(ShedSummary, rate_limiter.drain_aggregates(),
+                             'rate limit summaries')
+
+    @staticmethod
+    def decode_payload(payload):
+        try:
+            return payload.decode('utf-8')
+        except UnicodeDecodeError:
+            return str(payload)
+
+    def flush_aggregates(self, force=False):
+        """Store summaries of aggregation windows that have closed"""
+        closed = aggregator.close_windows(time.time(), force)
+        self.write_summaries(MQTTMessageAggregate, closed, 'aggregate windows')
+
+    def aggregate(self, batch):
+        """Feed messages of aggregated topics to the aggregator; return the rest"""
+        # Queue items carry monotonic receive times; windows use epoch time
+        offset = time.time() - time.monotonic()
+        raw = []
+        summaries = []
+        for item in batch:
+            try:
+                closed = aggregator.add(item[0], item[1], item[4] + offset)
+            except Exception as e:
+                logger.error(f"Error aggregating message on {item[0]}, storing it raw: {e}")
+                closed = False
+            if closed is False:
+                raw.append(item)
+            else:
+                summaries.extend(closed)
+        metrics.record_aggregated(len(batch) - len(raw))
+        self.write_summaries(MQTTMessageAggregate, summaries, 'aggregate windows')
+        return raw
+
+    def write_summaries(self, model, summaries, label):
+        """Store summary rows (aggregate windows, rate limit summaries) in one INSERT"""
+        if not summaries:
+            return
+        try:
+            summaries, rejected = self.insert_rows(model, summaries)
+            logger.debug(f"Saved {len(summaries)} {label} to database")
+            if rejected:
+                metrics.record_write_error(len(rejected))
+                logger.error(f"Database rejected {len(rejected)} {label}: {rejected[0][1]}")
+        except Exception as e:
+            metrics.record_write_error(len(summaries))
+            logger.error(f"Error saving {len(summaries)} {label}: {e}")
+            connection.close_if_unusable_or_obsolete()
+
+    def insert_rows(self, model, rows):
+        """
+        Insert rows with bulk_create. If the database rejects the batch, it is
+        bisected so only the offending rows are left out. Returns the stored
+        rows and a list of (row, error) for the rejected ones.
+        """
+        if not rows:
+            return rows, []
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(rows)
+            return rows, []
+        except (IntegrityError, DataError) as e:
+            # Primary keys set before the rollback no longer exist
+            for row in rows:
+                row.pk = None
+            if len(rows) == 1:
+                return [], [(rows[0], e)]
+        middle = len(rows) // 2
+        stored, rejected = self.insert_rows(model, rows[:middle])
+        more_stored, more_rejected = self.insert_rows(model, rows[middle:])
+        return stored + more_stored, rejected + more_rejected
+
+    def build_messages(self, batch):
+        """
+        Build MQTTMessage rows for a batch, decoding payloads of topics with a
+        configured schema. Returns (messages, quarantined) model instances.
+        """
+        messages = []
+        quarantined = []
+        for topic, payload, qos, retain, _ in batch:
+            decoded = None
+            rule = payload_decoder.rule_for(topic) if payload_decoder.enabled else None
+            if rule is not None:
+                try:
+                    decoded = rule[1](payload)
+                except PayloadError as e:
+                    quarantined.append(QuarantinedMessage(
+                        topic=topic, payload=self.decode_payload(payload),
+                        qos=qos, retain=retain, schema_topic=rule[0], error=str(e)))
+                    continue
+            messages.append(MQTTMessage(
+                topic=topic, payload=self.decode_payload(payload),
+                decoded=decoded, qos=qos, retain=retain))
+        return messages, quarantined
+
+    def write_batch(self, batch):
+        """
+        Store a batch of queued messages in one INSERT. Messages the database
+        rejects are quarantined with the database error instead of failing
+        the whole batch.
+        """
+        if aggregator.enabled:
+            batch = self.aggregate(batch)
+            if not batch:
+                return
+        try:
+            messages, quarantined = self.build_messages(batch)
+            messages, rejected = self.insert_rows(MQTTMessage, messages)
+            for message, error in rejected:
+                logger.error(f"Database rejected message on {message.topic}, "
+                             f"quarantining it: {error}")
+                quarantined.append(QuarantinedMessage(
+                    topic=message.topic, payload=message.payload, qos=message.qos,
+                    retain=message.retain, schema_topic='',
+                    error=f"Rejected by the database: {error}"))
+            if quarantined:
+                quarantined, lost = self.insert_rows(QuarantinedMessage, quarantined)
+                metrics.record_quarantined(len(quarantined))
+                if lost:
+                    metrics.record_write_error(len(lost))
+                    logger.error(f"Could not quarantine {len(lost)} messages: {lost[0][1]}")
+            metrics.record_stored(len(messages), batch[0][4])
+            logger.debug(f"Saved {len(messages)} messages to database")
+        except Exception as e:
+            metrics.record_write_error(len(batch))
+            logger.error(f"Error saving {len(batch)} MQTT messages: {e}")
+            connection.close_if_unusable_or_obsolete()
+            return
+
+        if forwarding.enabled and messages:
+            try:
+                forwarding.forward(messages)
+            except Exception as e:
+                metrics.record_forward_error(len(messages))
+                logger.error(f"Error forwarding {len(messages)} stored messages: {e}")
@@ -0,0 +1,78 @@
+"""
+Management command to show memory reports of running ingest processes
+"""
+import json
+import os
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from mqtt_service.memory import REPORT_DIR
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Show the latest memory report written by each running ingest process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pid', type=int, help='Only show this process')
+        parser.add_argument('--limit', type=int, default=10,
+                            help='Top allocators to show (default: 10)')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the raw reports as JSON')
+
+    def handle(self, *args, **options):
+        reports = []
+        for path in sorted(REPORT_DIR.glob('memory-*.json')):
+            with open(path) as f:
+                report = json.load(f)
+            if options['pid'] and report['pid'] != options['pid']:
+                continue
+            if not _alive(report['pid']):
+                path.unlink(missing_ok=True)
+                continue
+            reports.append(report)
+
+        if not reports:
+            raise CommandError(
+                f"No memory reports in {REPORT_DIR}. Reports are written every "
+                f"MQTT_MEMORY_SNAPSHOT_INTERVAL seconds by processes running the ingest pipeline.")
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+
+        for report in reports:
+            taken_at = datetime.fromtimestamp(report['taken_at']).isoformat(timespec='seconds')
+            guard = report['db_guard']
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"Process {report['pid']} at {taken_at}"))
+            self.stdout.write(
+                f"  RSS {report['rss_bytes'] / 1e6:.1f} MB "
+                f"({report['rss_growth_bytes'] / 1e6:+.1f} MB since start), "
+                f"{report['threads']} threads, gc counts {report['gc_counts']}")
+            self.stdout.write(
+                f"  DB guard: {guard['query_log_resets']} query log resets, "
+                f"{guard['connection_recycles']} connection recycles")
+
+            traced = report['tracemalloc']
+            if traced is None:
+                self.stdout.write("  tracemalloc off (set MQTT_MEMORY_PROFILING=True)")
+                continue
+            self.stdout.write(
+                f"  tracemalloc: {traced['current_bytes'] / 1e6:.1f} MB traced, "
+                f"peak {traced['peak_bytes'] / 1e6:.1f} MB")
+            for title, key in (('Top growth since start', 'top_since_start'),
+                               ('Top growth since last report', 'top_since_last')):
+                self.stdout.write(f"  {title}:")
+                for stat in traced[key][:options['limit']]:
+                    self.stdout.write(
+                        f"    {stat['size_diff_bytes'] / 1024:+10.1f} KiB "
+                        f"{stat['count_diff']:+8d} blocks  {stat['location']}")
@@ -0,0 +1,94 @@
+"""
+Management command to replay stored MQTT messages to the broker
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from mqtt_service.models import ReplayJob
+from mqtt_service.mqtt_client import MQTTClientManager
+from mqtt_service.replay import run_replay_job, resumable
+from mqtt_service.topics import validate_topic_filter
+
+
+class Command(BaseCommand):
+    help = 'Republish stored MQTT messages for a topic filter and time range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topic-filter',
+                            help='MQTT topic filter to replay, e.g. mqtt/poc/#')
+        parser.add_argument('--since', help='Replay messages from this ISO timestamp')
+        parser.add_argument('--until', help='Replay messages up to this ISO timestamp')
+        parser.add_argument('--mode', choices=['original', 'accelerated', 'max'],
+                            default='max', help='Replay timing (default: max)')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Speed-up factor for accelerated mode')
+        parser.add_argument('--target-prefix', default='',
+                            help='Prefix prepended to every republished topic')
+        parser.add_argument('--resume', type=int, metavar='JOB_ID',
+                            help='Resume an interrupted replay job')
+        parser.add_argument('--connect-timeout', type=float, default=30,
+                            help='Seconds to wait for the broker connection')
+
+    def handle(self, *args, **options):
+        job = self._get_job(options)
+
+        # A publish-only connection: this process must not subscribe and
+        # store the live traffic of the running service while replaying
+        MQTTClientManager.initialize(publish_only=True)
+        try:
+            if not MQTTClientManager.wait_until_connected(options['connect_timeout']):
+                raise CommandError('MQTT client could not connect to the broker')
+            self._replay(job)
+        finally:
+            MQTTClientManager.get_instance().disconnect()
+
+    def _replay(self, job):
+        self.stdout.write(
+            f"Replaying job {job.id} ({job.topic_filter}, mode={job.mode}) "
+            f"from id {job.last_id or 0}...")
+        try:
+            run_replay_job(job)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(
+                f"Replay interrupted after {job.published_count} messages. "
+                f"Resume with --resume {job.id}"))
+            return
+
+        style = self.style.SUCCESS if job.status == 'completed' else self.style.ERROR
+        self.stdout.write(style(
+            f"Replay job {job.id} {job.status}: {job.published_count} messages published"))
+
+    def _get_job(self, options):
+        if options['resume']:
+            try:
+                job = ReplayJob.objects.get(id=options['resume'])
+            except ReplayJob.DoesNotExist:
+                raise CommandError(f"Replay job {options['resume']} not found")
+            if not resumable(job):
+                raise CommandError(f"Replay job {job.id} is {job.status}")
+            return job
+
+        if not options['topic_filter']:
+            raise CommandError('--topic-filter or --resume is required')
+        try:
+            validate_topic_filter(options['topic_filter'])
+        except ValidationError as e:
+            raise CommandError(e.messages[0])
+
+        times = {}
+        for name in ('since', 'until'):
+            if options[name]:
+                times[name] = parse_datetime(options[name])
+                if times[name] is None:
+                    raise CommandError(f"Invalid --{name} timestamp")
+                if timezone.is_naive(times[name]):
+                    times[name] = timezone.make_aware(times[name])
+
+        return ReplayJob.objects.create(
+            topic_filter=options['topic_filter'],
+            mode=options['mode'],
+            speed=options['speed'],
+            target_prefix=options['target_prefix'],
+            **times,
+        )
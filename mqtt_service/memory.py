@@ -0,0 +1,206 @@
+"""
+Memory instrumentation and leak guard for long-running ingest processes
+
+- ``DatabaseGuard`` runs on the ingest writer thread. When DEBUG is on,
+  Django keeps the last 9000 queries of a connection; that cap is in
+  queries, not bytes, and each logged bulk INSERT holds the SQL of a whole
+  batch, so the log alone can reach hundreds of MB. The guard clears it
+  after every batch, and closes the writer's database connection every
+  MQTT_DB_RECYCLE_INTERVAL seconds so it is reopened fresh.
+- ``MemoryProfiler`` reports RSS and, with MQTT_MEMORY_PROFILING, takes a
+  tracemalloc snapshot every MQTT_MEMORY_SNAPSHOT_INTERVAL seconds and
+  diffs it against the snapshot taken at start and the previous periodic
+  one by allocating line. On-demand reports are diffed the same way
+  without replacing the previous snapshot.
+  Each report is also written to ``logs/memory-<pid>.json`` so the
+  ``memory_report`` command can read it from another process.
+"""
+import gc
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from django.conf import settings
+from django.db import connection, reset_queries
+
+logger = logging.getLogger('mqtt_service')
+
+TOP_ALLOCATORS = 25
+REPORT_DIR = settings.BASE_DIR / 'logs'
+
+_page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes():
+    """Current resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _page_size
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+def report_path(pid):
+    return REPORT_DIR / f'memory-{pid}.json'
+
+
+class DatabaseGuard:
+    """Keeps the writer thread's query log and database connection small"""
+
+    def __init__(self):
+        self.enabled = True
+        self.query_log_resets = 0
+        self.connection_recycles = 0
+        self.last_recycle_at = None
+        self._next_recycle = time.monotonic() + settings.MQTT_DB_RECYCLE_INTERVAL
+
+    def tick(self):
+        """Call on the writer thread after each batch"""
+        if not self.enabled:
+            return
+        if settings.DEBUG and connection.queries_log:
+            reset_queries()
+            self.query_log_resets += 1
+        now = time.monotonic()
+        if now >= self._next_recycle:
+            connection.close()
+            self.connection_recycles += 1
+            self.last_recycle_at = time.time()
+            self._next_recycle = now + settings.MQTT_DB_RECYCLE_INTERVAL
+
+    def snapshot(self):
+        return {
+            'query_log_resets': self.query_log_resets,
+            'connection_recycles': self.connection_recycles,
+            'last_recycle_at': self.last_recycle_at,
+        }
+
+
+def _diff(stats):
+    return [{
+        'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+        'size_bytes': stat.size,
+        'size_diff_bytes': stat.size_diff,
+        'count': stat.count,
+        'count_diff': stat.count_diff,
+    } for stat in stats[:TOP_ALLOCATORS]]
+
+
+class MemoryProfiler:
+    """Periodic RSS and tracemalloc reports for this process"""
+
+    FILTERS = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ]
+
+    def __init__(self):
+        self.started_rss = None
+        self._first = None
+        self._previous = None
+        self._report = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start periodic reports; tracemalloc only with MQTT_MEMORY_PROFILING"""
+        if self._thread and self._thread.is_alive():
+            return
+        self.started_rss = self.started_rss or rss_bytes()
+        if settings.MQTT_MEMORY_PROFILING and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if tracemalloc.is_tracing() and self._first is None:
+            self._first = self._previous = self._snapshot()
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='mqtt-memory-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+        try:
+            os.remove(report_path(os.getpid()))
+        except OSError:
+            pass
+
+    def _run(self):
+        while not self._stopping.wait(settings.MQTT_MEMORY_SNAPSHOT_INTERVAL):
+            try:
+                report = self.take_report(periodic=True)
+                self.write_report(report)
+                logger.info(
+                    f"Memory: RSS {report['rss_bytes'] / 1e6:.1f} MB "
+                    f"({report['rss_growth_bytes'] / 1e6:+.1f} MB since start)")
+            except Exception as e:
+                logger.error(f"Error taking memory report: {e}")
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(self.FILTERS)
+
+    def take_report(self, periodic=False):
+        """
+        Take a new report, with a tracemalloc snapshot diff when tracing. Only
+        periodic reports replace the previous snapshot and the latest report,
+        so on-demand reports don't skew the periodic diffs.
+        """
+        rss = rss_bytes()
+        report = {
+            'pid': os.getpid(),
+            'taken_at': time.time(),
+            'rss_bytes': rss,
+            'rss_growth_bytes': rss - (self.started_rss or rss),
+            'gc_counts': gc.get_count(),
+            'threads': threading.active_count(),
+            'db_guard': guard.snapshot(),
+            'tracemalloc': None,
+        }
+
+        if tracemalloc.is_tracing():
+            snapshot = self._snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            with self._lock:
+                first = self._first or snapshot
+                previous = self._previous or snapshot
+                if periodic:
+                    self._first = first
+                    self._previous = snapshot
+            report['tracemalloc'] = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top_since_start': _diff(snapshot.compare_to(first, 'lineno')),
+                'top_since_last': _diff(snapshot.compare_to(previous, 'lineno')),
+            }
+
+        if periodic:
+            with self._lock:
+                self._report = report
+        return report
+
+    def write_report(self, report):
+        path = report_path(report['pid'])
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(report, f)
+        os.replace(tmp, path)
+
+    def report(self, fresh=False):
+        """Return the latest report; take a new one if ``fresh`` or none exists yet"""
+        with self._lock:
+            report = self._report
+        if fresh or report is None:
+            report = self.take_report()
+        return report
+
+
+guard = DatabaseGuard()
+memory_profiler = MemoryProfiler()
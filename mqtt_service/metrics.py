@@ -0,0 +1,177 @@
+"""
+In-memory ingest metrics for health and readiness reporting
+
+Counters are written by the MQTT network threads (received, dropped, shed)
+and the ingest writer thread (stored and the rest). Every pooled broker
+connection has its own network thread, so the network-side counters are
+updated under a lock; the writer-side counters have a single writer and
+take none. Readers never lock and may see slightly stale values.
+"""
+import threading
+import time
+from django.conf import settings
+from .topics import TopicRuleCache
+
+THROUGHPUT_WINDOW = 60
+MAX_TOPIC_CACHE = 10000
+
+
+class RateCounter:
+    """Events per second over a sliding window of one-second buckets"""
+
+    def __init__(self, window=THROUGHPUT_WINDOW):
+        self.window = window
+        self._seconds = [0] * window
+        self._counts = [0] * window
+
+    def add(self, count=1, now=None):
+        second = int(now or time.time())
+        index = second % self.window
+        if self._seconds[index] != second:
+            self._seconds[index] = second
+            self._counts[index] = 0
+        self._counts[index] += count
+
+    def total(self, now=None):
+        """Events over the window"""
+        second = int(now or time.time())
+        return sum(count for bucket, count in zip(self._seconds, self._counts)
+                   if second - self.window < bucket <= second)
+
+    def rate(self, now=None):
+        """Average events per second over the window"""
+        return self.total(now) / self.window
+
+
+class IngestMetrics:
+    """Process-wide ingest counters"""
+
+    def __init__(self):
+        self.received_total = 0
+        self.stored_total = 0
+        self.dropped_total = 0
+        self.aggregated_total = 0
+        self.quarantined_total = 0
+        self.write_errors_total = 0
+        self.forward_errors_total = 0
+        self.shed = {}
+        self.last_write_lag = None
+        self.last_write_at = None
+        self.subscriptions = list(settings.MQTT_TOPICS)
+        self.received_rate = RateCounter()
+        self.stored_rate = RateCounter()
+        self.dropped_rate = RateCounter()
+        self._last_message_at = {}
+        self._subscription_cache = self._subscription_rules()
+        self._queue_depth = None
+        self._oldest_pending = None
+        self._writer_stopped = None
+        self._lock = threading.Lock()
+
+    def bind_queue(self, depth, oldest_pending, writer_stopped=None):
+        """
+        Register callables reporting ingest queue depth, oldest item receive
+        time and whether the writer thread has died
+        """
+        self._queue_depth = depth
+        self._oldest_pending = oldest_pending
+        self._writer_stopped = writer_stopped
+
+    def set_subscriptions(self, subscriptions):
+        """Set the topic filters reported under ``topics`` in snapshot()"""
+        self.subscriptions = list(dict.fromkeys(subscriptions))
+        self._subscription_cache = self._subscription_rules()
+
+    def _subscription_rules(self):
+        return TopicRuleCache(((sub, sub) for sub in self.subscriptions),
+                              all_matches=True, max_size=MAX_TOPIC_CACHE)
+
+    def _subscriptions_for(self, topic):
+        return self._subscription_cache.get(topic)
+
+    def record_received(self, topic, now=None):
+        """Record a message received from the broker (network threads)"""
+        now = now or time.time()
+        with self._lock:
+            self.received_total += 1
+            self.received_rate.add(1, now)
+            for subscription in self._subscriptions_for(topic):
+                self._last_message_at[subscription] = now
+
+    def record_dropped(self, count=1):
+        """Record messages dropped because the ingest queue stayed full"""
+        with self._lock:
+            self.dropped_total += count
+            self.dropped_rate.add(count)
+
+    def record_aggregated(self, count):
+        """Record messages folded into aggregation windows instead of stored raw"""
+        self.aggregated_total += count
+
+    def record_quarantined(self, count):
+        """Record messages that failed their payload schema"""
+        self.quarantined_total += count
+
+    def record_shed(self, rule, action):
+        """Record a message shed (or sampled through) by a rate limit rule"""
+        with self._lock:
+            counters = self.shed.get(rule)
+            if counters is None:
+                counters = self.shed[rule] = {
+                    'dropped': 0, 'sampled': 0, 'aggregated': 0}
+            counters[action] += 1
+
+    def record_stored(self, count, oldest_received, now=None):
+        """Record a committed batch; ``oldest_received`` is a time.monotonic() value"""
+        self.stored_total += count
+        self.stored_rate.add(count, now)
+        self.last_write_lag = time.monotonic() - oldest_received
+        self.last_write_at = now or time.time()
+
+    def record_write_error(self, count):
+        self.write_errors_total += count
+
+    def record_forward_error(self, count):
+        """Record stored messages that could not be queued for forwarding"""
+        self.forward_errors_total += count
+
+    def queue_depth(self):
+        return self._queue_depth() if self._queue_depth else 0
+
+    def write_lag(self):
+        """Seconds between receiving a message and committing it to the database"""
+        lag = self.last_write_lag or 0.0
+        oldest = self._oldest_pending() if self._oldest_pending else None
+        if oldest is not None:
+            lag = max(lag, time.monotonic() - oldest)
+        return lag
+
+    def snapshot(self):
+        """Return a JSON-serializable view of the current metrics"""
+        now = time.time()
+        return {
+            'queue_depth': self.queue_depth(),
+            'writer_stopped': bool(self._writer_stopped and self._writer_stopped()),
+            'received_total': self.received_total,
+            'stored_total': self.stored_total,
+            'dropped_total': self.dropped_total,
+            'dropped_last_minute': self.dropped_rate.total(now),
+            'aggregated_total': self.aggregated_total,
+            'quarantined_total': self.quarantined_total,
+            'write_errors_total': self.write_errors_total,
+            'forward_errors_total': self.forward_errors_total,
+            'shed': {rule: dict(counters) for rule, counters in list(self.shed.items())},
+            'write_lag_seconds': round(self.write_lag(), 3),
+            'received_per_second': round(self.received_rate.rate(now), 2),
+            'stored_per_second': round(self.stored_rate.rate(now), 2),
+            'topics': {
+                subscription: {
+                    'last_message_age_seconds': round(now - self._last_message_at[subscription], 3)
+                    if subscription in self._last_message_at else None
+                }
+                for subscription in self.subscriptions
+            },
+        }
+
+
+metrics = IngestMetrics()
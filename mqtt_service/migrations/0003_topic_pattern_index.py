@@ -0,0 +1,28 @@
+from django.db import migrations
+
+INDEX_NAME = 'mqtt_service_mqttmessage_topic_like_idx'
+
+
+def forwards(apps, schema_editor):
+    # Prefix lookups on PostgreSQL need a pattern_ops index when the database
+    # collation is not "C"; SQLite range scans use the (topic, timestamp) index.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} "
+            "ON mqtt_service_mqttmessage (topic varchar_pattern_ops)")
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mqtt_service', '0002_message_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-19 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mqtt_service', '0003_topic_pattern_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcknowledgeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criteria', models.JSONField(default=dict)),
+                ('chunk_size', models.IntegerField(default=1000)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total_count', models.BigIntegerField(default=0)),
+                ('updated_count', models.BigIntegerField(default=0)),
+                ('last_id', models.BigIntegerField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mqttmessage',
+            index=models.Index(condition=models.Q(('processed', False)), fields=['id'], name='mqtt_msg_unprocessed_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mqtt_service', '0004_acknowledge_jobs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mqttmessage',
+            index=models.Index(fields=['-timestamp'], name='mqtt_msg_timestamp_idx'),
+        ),
+    ]
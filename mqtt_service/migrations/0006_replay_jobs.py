@@ -0,0 +1,35 @@
+# Generated by Django 4.2 on 2026-10-19 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mqtt_service', '0005_message_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplayJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic_filter', models.CharField(max_length=255)),
+                ('since', models.DateTimeField(blank=True, null=True)),
+                ('until', models.DateTimeField(blank=True, null=True)),
+                ('mode', models.CharField(choices=[('original', 'Original timing'), ('accelerated', 'Accelerated'), ('max', 'Max throughput')], default='max', max_length=20)),
+                ('speed', models.FloatField(default=1.0)),
+                ('target_prefix', models.CharField(blank=True, default='', max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('paused', 'Paused'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('last_id', models.BigIntegerField(blank=True, null=True)),
+                ('published_count', models.BigIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-19 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mqtt_service', '0006_replay_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MQTTMessageAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=255)),
+                ('window_start', models.DateTimeField()),
+                ('window_end', models.DateTimeField()),
+                ('count', models.IntegerField()),
+                ('fields', models.JSONField(default=dict)),
+            ],
+            options={
+                'ordering': ['-window_start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mqttmessageaggregate',
+            index=models.Index(fields=['topic', '-window_start'], name='mqtt_servic_topic_388631_idx'),
+        ),
+    ]
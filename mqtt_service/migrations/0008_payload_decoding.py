@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-19 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mqtt_service', '0007_message_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuarantinedMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=255)),
+                ('payload', models.TextField()),
+                ('qos', models.IntegerField(default=0)),
+                ('retain', models.BooleanField(default=False)),
+                ('schema_topic', models.CharField(max_length=255)),
+                ('error', models.TextField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.AddField(
+            model_name='mqttmessage',
+            name='decoded',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='quarantinedmessage',
+            index=models.Index(fields=['topic', '-timestamp'], name='mqtt_servic_topic_691939_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-19 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mqtt_service', '0008_payload_decoding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShedSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=255)),
+                ('rule_topic', models.CharField(max_length=255)),
+                ('count', models.IntegerField()),
+                ('last_payload', models.TextField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shedsummary',
+            index=models.Index(fields=['topic', '-timestamp'], name='mqtt_servic_topic_0b88e6_idx'),
+        ),
+    ]
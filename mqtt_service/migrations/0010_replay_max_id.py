@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mqtt_service', '0009_shed_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='replayjob',
+            name='max_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
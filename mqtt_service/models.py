@@ -8,6 +8,7 @@ class MQTTMessage(models.Model):
     """Model to store MQTT messages"""
     topic = models.CharField(max_length=255)
     payload = models.TextField()
+    decoded = models.JSONField(null=True, blank=True)
     qos = models.IntegerField(default=0)
     retain = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
@@ -18,6 +19,65 @@ class MQTTMessage(models.Model):
         indexes = [
             models.Index(fields=['topic', '-timestamp']),
             models.Index(fields=['processed', '-timestamp']),
+            models.Index(fields=['-timestamp'], name='mqtt_msg_timestamp_idx'),
+            models.Index(fields=['id'], condition=models.Q(processed=False),
+                         name='mqtt_msg_unprocessed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} - {self.timestamp}"
+
+
+class QuarantinedMessage(models.Model):
+    """Model to store messages that failed their topic's payload schema"""
+    topic = models.CharField(max_length=255)
+    payload = models.TextField()
+    qos = models.IntegerField(default=0)
+    retain = models.BooleanField(default=False)
+    schema_topic = models.CharField(max_length=255)
+    error = models.TextField()
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['topic', '-timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} - {self.timestamp}"
+
+
+class MQTTMessageAggregate(models.Model):
+    """Model to store one summary per topic and window for aggregated topics"""
+    topic = models.CharField(max_length=255)
+    window_start = models.DateTimeField()
+    window_end = models.DateTimeField()
+    count = models.IntegerField()
+    fields = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ['-window_start']
+        indexes = [
+            models.Index(fields=['topic', '-window_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} - {self.window_start}"
+
+
+class ShedSummary(models.Model):
+    """Model to store per-topic counts of messages shed by aggregate rate limits"""
+    topic = models.CharField(max_length=255)
+    rule_topic = models.CharField(max_length=255)
+    count = models.IntegerField()
+    last_payload = models.TextField()
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['topic', '-timestamp']),
         ]
 
     def __str__(self):
@@ -43,3 +103,78 @@ class MQTTConnection(models.Model):
 
     def __str__(self):
         return f"{self.client_id} - {self.status}"
+
+
+class AcknowledgeJob(models.Model):
+    """Model to track bulk mark-processed jobs and their progress"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    criteria = models.JSONField(default=dict)
+    chunk_size = models.IntegerField(default=1000)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_count = models.BigIntegerField(default=0)
+    updated_count = models.BigIntegerField(default=0)
+    last_id = models.BigIntegerField(null=True, blank=True)
+    error_message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Acknowledge job {self.id} - {self.status}"
+
+
+class ReplayJob(models.Model):
+    """Model to track replays of stored messages back to the broker"""
+    MODE_CHOICES = [
+        ('original', 'Original timing'),
+        ('accelerated', 'Accelerated'),
+        ('max', 'Max throughput'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('paused', 'Paused'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    topic_filter = models.CharField(max_length=255)
+    since = models.DateTimeField(null=True, blank=True)
+    until = models.DateTimeField(null=True, blank=True)
+    mode = models.CharField(
+        max_length=20, choices=MODE_CHOICES, default='max')
+    speed = models.FloatField(default=1.0)
+    target_prefix = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='pending')
+    last_id = models.BigIntegerField(null=True, blank=True)
+    # Highest message id when the job was created; copies republished onto
+    # subscribed topics get higher ids and are never replayed again
+    max_id = models.BigIntegerField(null=True, blank=True)
+    published_count = models.BigIntegerField(default=0)
+    error_message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Replay job {self.id} ({self.topic_filter}) - {self.status}"
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.max_id is None:
+            self.max_id = MQTTMessage.objects.aggregate(
+                max_id=models.Max('id'))['max_id'] or 0
+        super().save(*args, **kwargs)
@@ -1,188 +1,246 @@
 """
 MQTT Client Manager for handling MQTT connections and message reception
+
+The manager holds a pool of named broker connections (see ``brokers.py``).
+Each connection has its own paho client and network thread, so a broker that
+is slow or reconnecting never stalls ingest from the others; all of them
+feed the same ingest pipeline.
+
+Connecting never blocks the caller: the broker connection (DNS, TCP, TLS and
+CONNACK) is established by paho's network thread, and readiness is reported
+through ``MQTTClientManager.status()``.
 """
 import os
 import logging
+import threading
 import time
 import paho.mqtt.client as mqtt
 from django.conf import settings
 from django.utils import timezone
-from .models import MQTTMessage, MQTTConnection
+from .brokers import load_brokers, probe
+from .ingest import IngestPipeline
+from .metrics import metrics
+from .models import MQTTConnection
+from .ratelimit import rate_limiter
+from .topics import TopicRuleCache
+from .transport import TimedClient, tls_context
 
 logger = logging.getLogger('mqtt_service')
-client_id = f"{settings.MQTT_CLIENT_ID}-{os.getpid()}"
 
 
-class MQTTClientManager:
-    """Singleton class to manage MQTT client connection and message handling"""
-
-    _instance = None
-    _client = None
-    _is_connected = False
-    _connecting = False
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(MQTTClientManager, cls).__new__(cls)
-        return cls._instance
-
-    @classmethod
-    def initialize(cls):
-        """Initialize MQTT Client"""
-        try:
-            instance = cls()
-            # Disconnect any existing client first
-            if instance._client:
-                try:
-                    instance._client.loop_stop()
-                    instance._client.disconnect()
-                    time.sleep(0.5)
-                except Exception as e:
-                    logger.debug(f"Error stopping old client: {e}")
-            instance.connect()
-        except Exception as e:
-            logger.error(f"Failed to initialize MQTT client: {e}")
+def get_client_id(broker=None):
+    """Return the client id for this process (computed after any fork)"""
+    client_id = f"{settings.MQTT_CLIENT_ID}-{os.getpid()}"
+    return f"{client_id}-{broker}" if broker else client_id
+
+
+class BrokerConnection:
+    """Connection to one broker of the pool, with its own client and network thread"""
+
+    def __init__(self, config, client_id, subscribe=True):
+        self.config = config
+        self.name = config.name
+        self.client_id = client_id
+        self.subscribe = subscribe
+        self._client = None
+        self._is_connected = False
+        self._connecting = False
+        self._loop_running = False
+        self._stopping = False
+        self._state = 'disabled'
+        self._last_error = None
+        self._connected_since = None
+        self._host_index = 0
+        self._failures = 0
+        self._failovers = 0
+
+    @property
+    def host(self):
+        """(host, port) currently in use"""
+        return self.config.hosts[self._host_index]
+
+    def _build_client(self):
+        """Create the long-lived client of this broker"""
+        logger.info(f"[{self.name}] Initializing MQTT client...")
+        client = TimedClient(client_id=self.client_id, clean_session=True)
+
+        # Set callbacks
+        client.on_connect = self._on_connect
+        client.on_connect_fail = self._on_connect_fail
+        client.on_disconnect = self._on_disconnect
+        client.on_message = self._on_message
+        client.on_publish = self._on_publish
+        client.on_subscribe = self._on_subscribe
+        client.on_log = self._on_log
+
+        # Set username and password if provided
+        if self.config.username and self.config.password:
+            client.username_pw_set(self.config.username, self.config.password)
+
+        # Enable TLS (by default for port 8883, e.g. HiveMQ Cloud) with a
+        # shared context that resumes sessions on reconnect
+        if self.config.tls is not None:
+            client.tls_set_context(tls_context(self.config.tls))
+            logger.info(f"[{self.name}] TLS enabled for MQTT connection")
+
+        # Set automatic reconnect (jittered exponential backoff)
+        client.reconnect_delay_set(min_delay=1, max_delay=32)
+        return client
 
     def connect(self):
-        """Establish MQTT connection"""
-        if self._connecting:
-            logger.debug("Already connecting, skipping...")
+        """
+        Start connecting to the broker.
+
+        Returns immediately; the network thread performs the connection and
+        keeps reconnecting the same client with backoff while the broker is
+        unreachable.
+        """
+        if self._connecting or self._loop_running:
+            logger.debug(f"[{self.name}] Already connecting, skipping...")
             return
 
         try:
             self._connecting = True
+            self._stopping = False
+            if self._client is None:
+                self._client = self._build_client()
 
-            # Stop any existing loop
-            if self._client:
-                try:
-                    self._client.loop_stop()
-                    self._client.disconnect()
-                    time.sleep(0.5)
-                except Exception as e:
-                    logger.debug(f"Error stopping existing client: {e}")
-
-            logger.info("Initializing MQTT client...")
-
-            self._client = mqtt.Client(
-                client_id=client_id,
-                clean_session=True
-            )
-
-            # Set callbacks
-            self._client.on_connect = self._on_connect
-            self._client.on_disconnect = self._on_disconnect
-            self._client.on_message = self._on_message
-            self._client.on_publish = self._on_publish
-            self._client.on_subscribe = self._on_subscribe
-            self._client.on_log = self._on_log
-
-            # Set username and password if provided
-            if settings.MQTT_USERNAME and settings.MQTT_PASSWORD:
-                self._client.username_pw_set(
-                    settings.MQTT_USERNAME,
-                    settings.MQTT_PASSWORD
-                )
-
-            # Enable TLS for port 8883 (HiveMQ Cloud)
-            if settings.MQTT_BROKER_PORT == 8883:
-                self._client.tls_set()
-                self._client.tls_insecure_set(False)
-                logger.info("TLS enabled for MQTT connection")
-
-            # Set automatic reconnect
-            self._client.reconnect_delay_set(min_delay=1, max_delay=32)
-
-            # Connect to broker
-            logger.info(
-                f"Connecting to MQTT broker at {settings.MQTT_BROKER_HOST}:{settings.MQTT_BROKER_PORT}...")
-            self._client.connect(
-                settings.MQTT_BROKER_HOST,
-                settings.MQTT_BROKER_PORT,
-                keepalive=settings.MQTT_KEEPALIVE
-            )
-
-            # Subscribe to topics
-            for topic in settings.MQTT_TOPICS:
-                logger.info(f"Subscribing to topic: {topic}")
-                self._client.subscribe(topic)
+            # Connect to broker from the network thread
+            host, port = self.host
+            logger.info(f"[{self.name}] Connecting to MQTT broker at {host}:{port}...")
+            self._state = 'connecting'
+            self._client.connect_async(host, port, keepalive=self.config.keepalive)
 
             # Start the network loop
             self._client.loop_start()
-            logger.info("MQTT client started successfully")
+            self._loop_running = True
+            logger.info(f"[{self.name}] MQTT client started")
 
         except Exception as e:
-            logger.error(f"Error connecting to MQTT broker: {e}")
+            logger.error(f"[{self.name}] Error connecting to MQTT broker: {e}")
+            self._state = 'error'
+            self._last_error = str(e)
             self._update_connection_status('error', str(e))
         finally:
             self._connecting = False
 
     def disconnect(self):
-        """Disconnect from MQTT broker"""
-        try:
-            if self._client:
-                self._client.loop_stop()
-                self._client.disconnect()
-                self._is_connected = False
-                logger.info("MQTT client disconnected")
-        except Exception as e:
-            logger.error(f"Error disconnecting: {e}")
+        """Disconnect from the broker and stop the network thread"""
+        self._stopping = True
+        if self._client:
+            self._client.disconnect()
+            self._client.loop_stop()
+            self._loop_running = False
+            self._is_connected = False
+            self._state = 'disconnected'
+            logger.info(f"[{self.name}] MQTT client disconnected")
+
+    def _record_failure(self, client):
+        """
+        Count a failed connection attempt; after ``failover_after`` of them
+        switch to the next host. Runs on the network thread, before paho's
+        next reconnect attempt, which then uses the new host.
+        """
+        self._failures += 1
+        if self._stopping or len(self.config.hosts) < 2 or \
+                self._failures < self.config.failover_after:
+            return
+        self._failures = 0
+        self._failovers += 1
+        self._host_index = (self._host_index + 1) % len(self.config.hosts)
+        host, port = self.host
+        logger.warning(f"[{self.name}] Failing over to {host}:{port}")
+        client.connect_async(host, port, keepalive=self.config.keepalive)
+
+    def check_health(self):
+        """Fail back to the primary host once it is reachable again (health thread)"""
+        if self._host_index == 0 or self._stopping or not self._client:
+            return
+        host, port = self.config.hosts[0]
+        if not probe(host, port):
+            return
+        logger.info(f"[{self.name}] Primary broker {host}:{port} is reachable, failing back")
+        self._stopping = True
+        self._client.disconnect()
+        self._client.loop_stop()
+        self._host_index = 0
+        self._failures = 0
+        self._stopping = False
+        self._state = 'connecting'
+        self._client.connect_async(host, port, keepalive=self.config.keepalive)
+        self._client.loop_start()
 
     def _on_connect(self, client, userdata, flags, rc):
         """Callback for MQTT connection"""
         if rc == 0:
-            logger.info("MQTT client connected successfully")
+            logger.info(f"[{self.name}] MQTT client connected successfully")
             self._is_connected = True
+            self._state = 'connected'
+            self._last_error = None
+            self._connected_since = timezone.now()
+            self._failures = 0
+            client.timings.phase('connack')
+            client.save_tls_session()
+
+            # Subscribe on every connect so subscriptions survive reconnects
+            mids = []
+            for topic in self.config.topics if self.subscribe else ():
+                logger.info(f"[{self.name}] Subscribing to topic: {topic}")
+                result, mid = client.subscribe(topic)
+                if result == mqtt.MQTT_ERR_SUCCESS:
+                    mids.append(mid)
+            client.timings.expect_subacks(mids)
+
             self._update_connection_status('connected')
         else:
             error_message = mqtt.connack_string(rc)
             logger.error(
-                f"MQTT connection failed with code {rc}: {error_message}")
+                f"[{self.name}] MQTT connection failed with code {rc}: {error_message}")
+            self._state = 'error'
+            self._last_error = error_message
             self._update_connection_status('error', error_message)
+            self._record_failure(client)
+
+    def _on_connect_fail(self, client, userdata):
+        """Callback for a failed connection attempt (broker unreachable)"""
+        host, port = self.host
+        logger.warning(
+            f"[{self.name}] Could not reach MQTT broker at {host}:{port}, retrying")
+        self._state = 'connecting'
+        self._last_error = 'Broker unreachable'
+        self._record_failure(client)
 
     def _on_disconnect(self, client, userdata, rc):
         """Callback for MQTT disconnection"""
+        self._connected_since = None
+        self._is_connected = False
         if rc != 0:
-            logger.warning(f"Unexpected MQTT disconnection with code {rc}")
-            self._is_connected = False
-            self._update_connection_status('disconnected')
+            logger.warning(f"[{self.name}] Unexpected MQTT disconnection with code {rc}")
+            self._state = 'connecting'
         else:
-            logger.info("MQTT client disconnected cleanly")
-            self._is_connected = False
-            self._update_connection_status('disconnected')
+            logger.info(f"[{self.name}] MQTT client disconnected cleanly")
+            self._state = 'disconnected'
+        self._update_connection_status('disconnected')
 
     def _on_message(self, client, userdata, msg):
-        """Callback for receiving MQTT messages"""
+        """Callback for receiving MQTT messages; storage happens on the ingest writer thread"""
         try:
-            logger.debug(
-                f"Message received on topic {msg.topic}: {msg.payload}")
-
-            # Decode payload
-            try:
-                payload = msg.payload.decode('utf-8')
-            except UnicodeDecodeError:
-                payload = str(msg.payload)
-
-            # Save message to database
-            mqtt_message = MQTTMessage.objects.create(
-                topic=msg.topic,
-                payload=payload,
-                qos=msg.qos,
-                retain=msg.retain
-            )
-
-            logger.info(
-                f"Message saved to database: {mqtt_message.id} from topic {msg.topic}")
-
+            metrics.record_received(msg.topic)
+            if rate_limiter.enabled and not rate_limiter.allow(msg.topic, msg.payload):
+                return
+            IngestPipeline.get_instance().submit(
+                msg.topic, msg.payload, msg.qos, msg.retain)
         except Exception as e:
-            logger.error(f"Error processing MQTT message: {e}")
+            logger.error(f"[{self.name}] Error processing MQTT message: {e}")
 
     def _on_publish(self, client, userdata, mid):
         """Callback for message published"""
-        logger.debug(f"Message published with id {mid}")
+        logger.debug(f"[{self.name}] Message published with id {mid}")
 
     def _on_subscribe(self, client, userdata, mid, granted_qos):
         """Callback for subscription"""
-        logger.info(f"Subscription successful with QoS: {granted_qos}")
+        client.timings.suback(mid)
+        logger.info(f"[{self.name}] Subscription successful with QoS: {granted_qos}")
 
     def _on_log(self, client, userdata, level, buf):
         """Callback for logging"""
@@ -205,7 +263,7 @@ class MQTTClientManager:
             # Check if table exists
             with db_connection.cursor() as cursor:
                 cursor.execute("""
-                    SELECT name FROM sqlite_master 
+                    SELECT name FROM sqlite_master
                     WHERE type='table' AND name='mqtt_service_mqttconnection'
                 """)
                 if not cursor.fetchone():
@@ -214,7 +272,7 @@ class MQTTClientManager:
                     return
 
             mqtt_conn, created = MQTTConnection.objects.get_or_create(
-                client_id=client_id,
+                client_id=self.client_id,
                 defaults={'status': status}
             )
 
@@ -227,12 +285,139 @@ class MQTTClientManager:
                 mqtt_conn.last_disconnected = timezone.now()
 
             mqtt_conn.save()
-            logger.info(f"Connection status updated: {status}")
+            logger.info(f"[{self.name}] Connection status updated: {status}")
 
         except Exception as e:
             logger.debug(
                 f"Could not update connection status (table may not exist yet): {e}")
 
+    def publish(self, topic, payload, qos=0, retain=False):
+        """Publish a message to this broker"""
+        if self._client and self._is_connected:
+            try:
+                self._client.publish(topic, payload, qos, retain)
+                logger.info(f"[{self.name}] Message published to topic {topic}")
+                return True
+            except Exception as e:
+                logger.error(f"[{self.name}] Error publishing message: {e}")
+                return False
+        else:
+            logger.warning(f"[{self.name}] MQTT client not connected, cannot publish message")
+            return False
+
+    def status(self):
+        """Return the in-memory connection state without touching the database"""
+        host, port = self.host
+        return {
+            'state': self._state,
+            'connected': self._is_connected,
+            'client_id': self.client_id,
+            'broker': f"{host}:{port}",
+            'standby': self._host_index != 0,
+            'failovers': self._failovers,
+            'connect': self._client.timings.snapshot() if self._client else None,
+            'connected_since': self._connected_since,
+            'last_error': self._last_error,
+        }
+
+
+class MQTTClientManager:
+    """Singleton pool of broker connections; routes publishes by topic or broker name"""
+
+    _instance = None
+    _connections = {}
+    _routes = TopicRuleCache(())
+    _health_stop = None
+    _health_thread = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MQTTClientManager, cls).__new__(cls)
+        return cls._instance
+
+    @classmethod
+    def initialize(cls, publish_only=False):
+        """
+        Initialize broker connections and start connecting in the background.
+        ``publish_only`` connections (e.g. for replay_messages) don't
+        subscribe and don't start the ingest pipeline.
+        """
+        try:
+            instance = cls()
+            # Disconnect any existing clients first
+            if instance._connections:
+                try:
+                    instance.disconnect()
+                except Exception as e:
+                    logger.debug(f"Error stopping old clients: {e}")
+
+            configs = load_brokers()
+            single = len(configs) == 1
+            connections = {}
+            for config in configs:
+                client_id = config.client_id or get_client_id(None if single else config.name)
+                if publish_only:
+                    # Never take over the client id of the ingesting process
+                    client_id += '-publisher'
+                connections[config.name] = BrokerConnection(
+                    config, client_id, subscribe=not publish_only)
+            instance._connections = connections
+            instance._routes = TopicRuleCache(
+                ((topic_filter, connection) for connection in connections.values()
+                 for topic_filter in connection.config.publish_topics),
+                default=next(iter(connections.values()), None))
+
+            if not publish_only:
+                metrics.set_subscriptions(
+                    topic for config in configs for topic in config.topics)
+                IngestPipeline.get_instance().start()
+            instance.connect()
+        except Exception as e:
+            logger.error(f"Failed to initialize MQTT client: {e}")
+
+    def connect(self):
+        """Start connecting every broker and the standby health checks"""
+        for connection in self._connections.values():
+            connection.connect()
+
+        if any(len(c.config.hosts) > 1 for c in self._connections.values()):
+            self._health_stop = threading.Event()
+            self._health_thread = threading.Thread(
+                target=self._health_loop, args=(self._health_stop,),
+                name='mqtt-broker-health', daemon=True)
+            self._health_thread.start()
+
+    def _health_loop(self, stop):
+        while not stop.wait(settings.MQTT_BROKER_HEALTH_INTERVAL):
+            for connection in list(self._connections.values()):
+                try:
+                    connection.check_health()
+                except Exception as e:
+                    logger.error(f"[{connection.name}] Broker health check failed: {e}")
+
+    def disconnect(self):
+        """Disconnect from all brokers"""
+        try:
+            if self._health_stop:
+                self._health_stop.set()
+                self._health_thread.join(5)
+                self._health_stop = self._health_thread = None
+            for connection in self._connections.values():
+                try:
+                    connection.disconnect()
+                except Exception as e:
+                    logger.error(f"[{connection.name}] Error disconnecting: {e}")
+            IngestPipeline.get_instance().stop()
+        except Exception as e:
+            logger.error(f"Error disconnecting: {e}")
+
+    def route(self, topic):
+        """
+        Return the connection a topic is published to: the first broker with
+        a matching ``publish_topics`` filter, otherwise the first broker.
+        """
+        return self._routes.get(topic)
+
     @classmethod
     def get_instance(cls):
         """Get MQTT client manager instance"""
@@ -241,17 +426,51 @@ class MQTTClientManager:
         return cls._instance
 
     @classmethod
-    def publish_message(cls, topic, payload, qos=0, retain=False):
-        """Publish a message to MQTT broker"""
-        manager = cls.get_instance()
-        if manager._client and manager._is_connected:
-            try:
-                manager._client.publish(topic, payload, qos, retain)
-                logger.info(f"Message published to topic {topic}")
-                return True
-            except Exception as e:
-                logger.error(f"Error publishing message: {e}")
-                return False
+    def get_connection(cls, broker):
+        """Return the connection of a broker by name, or None"""
+        return cls.get_instance()._connections.get(broker)
+
+    @classmethod
+    def status(cls):
+        """Return the in-memory state of every broker without touching the database"""
+        connections = list(cls.get_instance()._connections.values())
+        brokers = {c.name: c.status() for c in connections}
+        connected = [c._is_connected for c in connections]
+        if not connections:
+            state = 'disabled'
+        elif all(connected):
+            state = 'connected'
+        elif any(connected):
+            state = 'degraded'
         else:
-            logger.warning("MQTT client not connected, cannot publish message")
+            state = connections[0]._state
+        return {
+            'state': state,
+            'connected': bool(connections) and all(connected),
+            'brokers': brokers,
+        }
+
+    @classmethod
+    def wait_until_connected(cls, timeout=10, broker=None):
+        """Block until all brokers (or ``broker``) are connected or ``timeout`` seconds pass"""
+        manager = cls.get_instance()
+        connections = [manager._connections[broker]] if broker else \
+            list(manager._connections.values())
+
+        def connected():
+            return bool(connections) and all(c._is_connected for c in connections)
+
+        deadline = time.monotonic() + timeout
+        while not connected() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        return connected()
+
+    @classmethod
+    def publish_message(cls, topic, payload, qos=0, retain=False, broker=None):
+        """Publish a message to ``broker``, or to the broker the topic routes to"""
+        manager = cls.get_instance()
+        connection = manager._connections.get(broker) if broker else manager.route(topic)
+        if connection is None:
+            logger.warning(f"No MQTT broker {broker or 'configured'}, cannot publish message")
             return False
+        return connection.publish(topic, payload, qos, retain)
@@ -0,0 +1,69 @@
+"""
+Paginators for large MQTT message tables
+"""
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+
+# Largest page a client can request with ?page_size=
+MAX_PAGE_SIZE = 10000
+
+# Below this many rows an exact COUNT(*) is cheap enough to always run
+EXACT_COUNT_THRESHOLD = 100000
+
+
+def estimate_row_count(model, using='default'):
+    """
+    Return the planner's estimate of the number of rows in ``model``'s table.
+
+    Uses ``pg_class.reltuples`` on PostgreSQL and ``sqlite_stat1`` (written by
+    ``ANALYZE``) on SQLite. Returns None when no estimate is available.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(table)])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'")
+            if not cursor.fetchone():
+                return None
+            cursor.execute(
+                "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids a full COUNT(*) on large unfiltered tables.
+
+    When the queryset has no filters and the table is estimated to hold more
+    than EXACT_COUNT_THRESHOLD rows, the database statistics estimate is used
+    as the count. Filtered querysets are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > EXACT_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class MessagePagination(PageNumberPagination):
+    """Page number pagination with a client-selectable ``page_size`` for message lists"""
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
@@ -0,0 +1,151 @@
+"""
+Bulk processing of stored MQTT messages
+
+Marking messages as processed is done in bounded chunks walked in id order,
+so each UPDATE touches at most ``chunk_size`` rows and holds its locks only
+briefly instead of blocking ingest for the whole backlog.
+"""
+import logging
+import threading
+from datetime import timedelta
+from django.db import connection, connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import MQTTMessage
+from .topics import topic_filter_q
+
+logger = logging.getLogger('mqtt_service')
+
+DEFAULT_CHUNK_SIZE = 1000
+# A running job whose checkpoint hasn't moved for this long was interrupted
+STALE_AFTER = 300
+
+# Jobs running in this process
+_running = set()
+_running_lock = threading.Lock()
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        return parse_datetime(value)
+    return value
+
+
+def acknowledge_queryset(criteria):
+    """
+    Build the queryset of unprocessed messages matching ``criteria``.
+
+    Supported keys: ``topic``, ``topic_filter``, ``id_from``, ``id_to``
+    (inclusive), ``since`` and ``until`` (timestamps, inclusive).
+    """
+    queryset = MQTTMessage.objects.filter(processed=False)
+    if criteria.get('topic'):
+        queryset = queryset.filter(topic=criteria['topic'])
+    if criteria.get('topic_filter'):
+        queryset = queryset.filter(topic_filter_q(
+            criteria['topic_filter'], connections[queryset.db].vendor))
+    if criteria.get('id_from') is not None:
+        queryset = queryset.filter(id__gte=criteria['id_from'])
+    if criteria.get('id_to') is not None:
+        queryset = queryset.filter(id__lte=criteria['id_to'])
+    if criteria.get('since'):
+        queryset = queryset.filter(timestamp__gte=_as_datetime(criteria['since']))
+    if criteria.get('until'):
+        queryset = queryset.filter(timestamp__lte=_as_datetime(criteria['until']))
+    return queryset.order_by()
+
+
+def acknowledge_messages(criteria, chunk_size=DEFAULT_CHUNK_SIZE, job=None):
+    """
+    Mark unprocessed messages matching ``criteria`` as processed.
+
+    Rows are updated ``chunk_size`` at a time in id order; each chunk runs in
+    its own short transaction. When ``job`` is given its progress and
+    checkpoint (``last_id``) are saved after every chunk and the job
+    continues from its checkpoint, which is how the resume action restarts
+    interrupted jobs. Returns the number of rows updated.
+    """
+    queryset = acknowledge_queryset(criteria)
+    last_id = job.last_id if job else None
+    updated_count = job.updated_count if job else 0
+
+    while True:
+        chunk = queryset
+        if last_id is not None:
+            chunk = chunk.filter(id__gt=last_id)
+        ids = list(chunk.order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            break
+
+        updated_count += MQTTMessage.objects.filter(
+            id__in=ids, processed=False).update(processed=True)
+        last_id = ids[-1]
+
+        if job:
+            job.updated_count = updated_count
+            job.last_id = last_id
+            job.save(update_fields=['updated_count', 'last_id', 'updated_at'])
+
+    return updated_count
+
+
+def run_acknowledge_job(job):
+    """Run an AcknowledgeJob to completion, recording its final status"""
+    try:
+        job.status = 'running'
+        job.error_message = None
+        job.total_count = job.updated_count + \
+            acknowledge_queryset(job.criteria).count()
+        job.save(update_fields=['status', 'error_message', 'total_count', 'updated_at'])
+
+        acknowledge_messages(job.criteria, job.chunk_size, job=job)
+
+        job.status = 'completed'
+        logger.info(
+            f"Acknowledge job {job.id} completed: {job.updated_count} messages marked as processed")
+    except Exception as e:
+        logger.error(f"Acknowledge job {job.id} failed: {e}")
+        job.status = 'failed'
+        job.error_message = str(e)
+    finally:
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error_message',
+                 'finished_at', 'updated_at'])
+
+
+def start_acknowledge_job(job):
+    """
+    Run an AcknowledgeJob in a background thread, continuing from its
+    checkpoint. Returns None if the job is already running in this process.
+    """
+    with _running_lock:
+        if job.id in _running:
+            return None
+        _running.add(job.id)
+
+    def target():
+        try:
+            run_acknowledge_job(job)
+        finally:
+            with _running_lock:
+                _running.discard(job.id)
+            connection.close()
+
+    thread = threading.Thread(
+        target=target, name=f'acknowledge-job-{job.id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def resumable(job):
+    """
+    Return True if a job can be restarted from its checkpoint: it failed,
+    never started, or was left running by a process that stopped
+    """
+    with _running_lock:
+        if job.id in _running:
+            return False
+    if job.status in ('pending', 'failed'):
+        return True
+    return job.status == 'running' and \
+        timezone.now() - job.updated_at > timedelta(seconds=STALE_AFTER)
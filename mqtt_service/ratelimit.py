@@ -0,0 +1,180 @@
+"""
+Per-topic rate limiting and load shedding at ingest
+
+Rules from ``MQTT_RATE_LIMITS`` map topic filters to token buckets. By
+default every concrete topic matching a rule gets its own bucket, so one
+flooding device is limited without affecting its neighbours. Messages over
+the limit are handled by the rule's action:
+
+- ``drop``: discard the message
+- ``sample``: keep one in every ``1 / sample_rate`` excess messages
+- ``aggregate``: discard the message but count it; one ShedSummary row per
+  topic (count and last payload) is stored on each flush, apart from the
+  device messages
+
+The limiter runs on the MQTT network threads, one per pooled broker
+connection, which can share buckets (``per_topic: false``) and topics. The
+allow/deny decision therefore takes one short lock around the bucket
+update; the ingest writer thread takes the same lock to drain aggregate
+summaries.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .metrics import metrics
+from .models import ShedSummary
+from .topics import topic_matches, validate_topic_filter
+
+ACTIONS = ('drop', 'sample', 'aggregate')
+MAX_CACHED_TOPICS = 100000
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled at ``rate`` tokens per second. ``now`` is a
+    ``time.monotonic()`` reading, or any clock later passed to ``consume``.
+    """
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def consume(self, now):
+        tokens = self.tokens + (now - self.updated) * self.rate
+        self.updated = now
+        if tokens >= 1:
+            self.tokens = min(tokens, self.burst) - 1
+            return True
+        self.tokens = tokens
+        return False
+
+
+class RateLimitRule:
+    """One entry of MQTT_RATE_LIMITS"""
+    __slots__ = ('topic', 'rate', 'burst', 'action',
+                 'sample_every', 'per_topic', 'bucket')
+
+    def __init__(self, topic, rate, burst=None, action='drop',
+                 sample_rate=0.1, per_topic=True):
+        try:
+            validate_topic_filter(topic)
+        except Exception:
+            raise ImproperlyConfigured(
+                f"MQTT_RATE_LIMITS: invalid topic filter {topic!r}")
+        if action not in ACTIONS:
+            raise ImproperlyConfigured(
+                f"MQTT_RATE_LIMITS: action must be one of {', '.join(ACTIONS)}")
+        if rate <= 0 or not 0 < sample_rate <= 1:
+            raise ImproperlyConfigured(
+                "MQTT_RATE_LIMITS: rate must be > 0 and sample_rate in (0, 1]")
+        self.topic = topic
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self.action = action
+        self.sample_every = max(1, round(1 / sample_rate))
+        self.per_topic = per_topic
+        self.bucket = None
+
+    def new_bucket(self, now):
+        """Return a bucket for a newly seen topic, shared unless per_topic"""
+        if self.per_topic:
+            return TokenBucket(self.rate, self.burst, now)
+        if self.bucket is None:
+            self.bucket = TokenBucket(self.rate, self.burst, now)
+        return self.bucket
+
+
+class TopicRateLimiter:
+    """Token-bucket limiter applied to every received message"""
+
+    def __init__(self, rules=None):
+        rules = settings.MQTT_RATE_LIMITS if rules is None else rules
+        self.rules = [RateLimitRule(**rule) for rule in rules]
+        self.enabled = bool(self.rules)
+        # topic -> (rule, bucket, excess counter) or None when no rule matches,
+        # least recently seen first
+        self._topics = OrderedDict()
+        self._aggregates = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, topic, now):
+        if len(self._topics) >= MAX_CACHED_TOPICS:
+            # Evict only the least recently seen topic; clearing the cache
+            # would reset every bucket whenever a flood of new topics arrives
+            self._topics.popitem(last=False)
+        for rule in self.rules:
+            if topic_matches(rule.topic, topic):
+                entry = [rule, rule.new_bucket(now), 0]
+                break
+        else:
+            entry = None
+        self._topics[topic] = entry
+        return entry
+
+    def allow(self, topic, payload, now=None):
+        """Return True if the message should be ingested"""
+        with self._lock:
+            return self._allow(topic, payload, now)
+
+    def _allow(self, topic, payload, now):
+        if now is None:
+            now = time.monotonic()
+        try:
+            entry = self._topics[topic]
+            self._topics.move_to_end(topic)
+        except KeyError:
+            entry = self._resolve(topic, now)
+        if entry is None:
+            return True
+
+        rule, bucket, _ = entry
+        if bucket.consume(now):
+            return True
+
+        if rule.action == 'sample':
+            entry[2] += 1
+            if entry[2] % rule.sample_every == 0:
+                metrics.record_shed(rule.topic, 'sampled')
+                return True
+        elif rule.action == 'aggregate':
+            summary = self._aggregates.get(topic)
+            if summary is None:
+                self._aggregates[topic] = [1, payload, rule.topic]
+            else:
+                summary[0] += 1
+                summary[1] = payload
+            metrics.record_shed(rule.topic, 'aggregated')
+            return False
+
+        metrics.record_shed(rule.topic, 'dropped')
+        return False
+
+    def drain_aggregates(self):
+        """
+        Return unsaved ShedSummary rows for the messages shed by aggregate
+        rules since the last call: the number shed and the last shed payload
+        per topic.
+        """
+        with self._lock:
+            if not self._aggregates:
+                return []
+            aggregates, self._aggregates = self._aggregates, {}
+
+        summaries = []
+        for topic, (count, payload, rule_topic) in aggregates.items():
+            try:
+                last_payload = payload.decode('utf-8')
+            except UnicodeDecodeError:
+                last_payload = str(payload)
+            summaries.append(ShedSummary(
+                topic=topic, rule_topic=rule_topic, count=count,
+                last_payload=last_payload))
+        return summaries
+
+
+rate_limiter = TopicRateLimiter()
@@ -0,0 +1,71 @@
+"""
+JSON rendering for MQTT Service API
+
+Uses orjson when it is installed and the standard library encoder
+otherwise; output matches DRF's JSONRenderer (compact, UTF-8, ISO 8601
+datetimes with ``Z``). Values wrapped in RawJSON are already-encoded JSON
+and are embedded in the output without being parsed or re-escaped.
+"""
+import json
+import uuid
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+_encoder = JSONEncoder()
+
+
+class RawJSON(bytes):
+    """Already-encoded JSON to embed in a response as is"""
+
+
+def dumps(data, default=None):
+    """Encode ``data`` as compact UTF-8 JSON bytes"""
+    default = default or _encoder.default
+    if orjson is not None:
+        return orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+    return json.dumps(
+        data, default=default, ensure_ascii=not api_settings.UNICODE_JSON,
+        allow_nan=not api_settings.STRICT_JSON, separators=(',', ':'),
+    ).encode('utf-8')
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson, with support for RawJSON values"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        # RawJSON values are encoded as unique placeholder strings, which
+        # are swapped for the raw bytes once the document is encoded
+        marker = uuid.uuid4().hex
+        embedded = []
+
+        def default(obj):
+            if isinstance(obj, RawJSON):
+                embedded.append(obj)
+                return f'{marker}{len(embedded) - 1}'
+            return _encoder.default(obj)
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is None:
+            body = dumps(data, default)
+        else:
+            # Browsable API; orjson has no configurable indent
+            body = json.dumps(
+                data, default=default, indent=indent,
+                ensure_ascii=self.ensure_ascii, allow_nan=not self.strict,
+            ).encode('utf-8')
+        body = body.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+        for index, raw in enumerate(embedded):
+            body = body.replace(f'"{marker}{index}"'.encode('ascii'), raw, 1)
+        return body
@@ -0,0 +1,194 @@
+"""
+Replay of stored MQTT messages back to the broker
+
+Rows are read in id order one page at a time (``id > last`` ordered by id,
+``PAGE_SIZE`` rows per query) as plain tuples, so memory use stays constant
+no matter how long the replayed range is, and no cursor stays open between
+pages: on SQLite an open read cursor would lock out the ingest writer for
+the whole replay. The range ends at the job's ``max_id``, so copies
+republished onto subscribed topics are not replayed again. Progress is
+checkpointed on the ReplayJob (``last_id``), so an interrupted replay
+resumes where it stopped.
+"""
+import logging
+import threading
+import time
+from django.db import connection, connections
+from django.db.models import Max
+from django.utils import timezone
+from .models import MQTTMessage, ReplayJob
+from .topics import topic_filter_q
+
+logger = logging.getLogger('mqtt_service')
+
+PAGE_SIZE = 2000
+CHECKPOINT_EVERY = 500
+PUBLISH_RETRY_TIMEOUT = 30
+
+# Stop events of replays running in this process, keyed by job id
+_running = {}
+_running_lock = threading.Lock()
+
+
+def replay_queryset(job, after=None):
+    """
+    Return the rows of a replay after id ``after`` (default: the job's
+    checkpoint) as (id, topic, payload, qos, retain, timestamp)
+    """
+    after = job.last_id if after is None else after
+    queryset = MQTTMessage.objects.filter(topic_filter_q(
+        job.topic_filter, connections[MQTTMessage.objects.db].vendor))
+    if job.since:
+        queryset = queryset.filter(timestamp__gte=job.since)
+    if job.until:
+        queryset = queryset.filter(timestamp__lte=job.until)
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    if job.max_id is not None:
+        queryset = queryset.filter(id__lte=job.max_id)
+    return queryset.order_by('id').values_list(
+        'id', 'topic', 'payload', 'qos', 'retain', 'timestamp')
+
+
+def replay_rows(job):
+    """Yield the remaining rows of a replay, one short query per page"""
+    after = job.last_id
+    while True:
+        page = list(replay_queryset(job, after)[:PAGE_SIZE])
+        if not page:
+            return
+        yield from page
+        after = page[-1][0]
+
+
+def _default_publish(topic, payload, qos, retain):
+    from .mqtt_client import MQTTClientManager
+    return MQTTClientManager.publish_message(topic, payload, qos, retain)
+
+
+def _publish_with_retry(publish, stop_event, topic, payload, qos, retain):
+    """Publish, retrying while the broker connection is down"""
+    deadline = time.monotonic() + PUBLISH_RETRY_TIMEOUT
+    while not publish(topic, payload, qos, retain):
+        if stop_event.is_set() or time.monotonic() > deadline:
+            return False
+        time.sleep(0.5)
+    return True
+
+
+def _checkpoint(job):
+    job.save(update_fields=['last_id', 'published_count', 'updated_at'])
+
+
+def run_replay_job(job, publish=None, stop_event=None):
+    """
+    Replay a job's messages until done, stopped or failed.
+
+    ``original`` mode keeps the recorded gaps between messages,
+    ``accelerated`` divides them by ``job.speed`` and ``max`` publishes as
+    fast as the client accepts. Delays are scheduled against a fixed anchor,
+    so sleep overshoot does not accumulate over long replays.
+    """
+    publish = publish or _default_publish
+    stop_event = stop_event or threading.Event()
+
+    if job.mode == 'original':
+        speed = 1.0
+    elif job.mode == 'accelerated':
+        speed = job.speed if job.speed > 0 else 1.0
+    else:
+        speed = None
+
+    job.status = 'running'
+    job.error_message = None
+    if job.max_id is None:
+        # Jobs created before max_id was recorded
+        job.max_id = MQTTMessage.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    job.save(update_fields=['status', 'error_message', 'max_id', 'updated_at'])
+    logger.info(f"Replay job {job.id} started from id {job.last_id}")
+
+    anchor = None
+    try:
+        for message_id, topic, payload, qos, retain, timestamp in replay_rows(job):
+            if stop_event.is_set():
+                job.status = 'paused'
+                break
+
+            if speed is not None:
+                if anchor is None:
+                    anchor = (time.monotonic(), timestamp)
+                delay = anchor[0] + \
+                    (timestamp - anchor[1]).total_seconds() / speed - time.monotonic()
+                if delay > 0 and stop_event.wait(delay):
+                    job.status = 'paused'
+                    break
+
+            if not _publish_with_retry(publish, stop_event, job.target_prefix + topic,
+                                       payload, qos, retain):
+                job.status = 'paused' if stop_event.is_set() else 'failed'
+                if job.status == 'failed':
+                    job.error_message = 'MQTT client not connected, replay stopped'
+                break
+
+            job.last_id = message_id
+            job.published_count += 1
+            if job.published_count % CHECKPOINT_EVERY == 0:
+                _checkpoint(job)
+        else:
+            job.status = 'completed'
+            job.finished_at = timezone.now()
+    except BaseException as e:
+        # KeyboardInterrupt and friends pause the job so it can be resumed
+        job.status = 'failed' if isinstance(e, Exception) else 'paused'
+        job.error_message = str(e) or None
+        if isinstance(e, Exception):
+            logger.error(f"Replay job {job.id} failed: {e}")
+        raise
+    finally:
+        job.save(update_fields=['status', 'last_id', 'published_count',
+                                'error_message', 'finished_at', 'updated_at'])
+        logger.info(
+            f"Replay job {job.id} {job.status}: {job.published_count} messages published")
+
+    return job
+
+
+def start_replay_job(job):
+    """Run a ReplayJob in a background thread of this process"""
+    stop_event = threading.Event()
+    with _running_lock:
+        if job.id in _running:
+            return None
+        _running[job.id] = stop_event
+
+    def target():
+        try:
+            # Work on a fresh copy so callers can keep serializing theirs
+            run_replay_job(ReplayJob.objects.get(pk=job.pk), stop_event=stop_event)
+        except Exception:
+            pass
+        finally:
+            with _running_lock:
+                _running.pop(job.id, None)
+            connection.close()
+
+    thread = threading.Thread(
+        target=target, name=f'replay-job-{job.id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def stop_replay_job(job_id):
+    """Ask a replay running in this process to pause; returns False if not running here"""
+    with _running_lock:
+        stop_event = _running.get(job_id)
+    if stop_event is None:
+        return False
+    stop_event.set()
+    return True
+
+
+def resumable(job):
+    """Return True if a job can be (re)started"""
+    return job.status in ('pending', 'paused', 'failed') and \
+        job.id not in _running
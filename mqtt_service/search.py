@@ -0,0 +1,145 @@
+"""
+Indexed full-text search over stored MQTT messages
+
+SQLite uses an external-content FTS5 table kept in sync with
+``mqtt_service_mqttmessage`` by triggers, so every insert made by the ingest
+path is indexed in the same transaction. PostgreSQL uses a GIN index on a
+``tsvector`` expression. Other databases fall back to ``icontains`` lookups.
+"""
+from django.db import connections
+from django.db.models import Q, Value, FloatField
+from .topics import topic_prefix_q
+
+FTS_TABLE = 'mqtt_service_mqttmessage_fts'
+PG_TSVECTOR = "to_tsvector('simple', topic || ' ' || payload)"
+
+
+def search_backend(queryset):
+    """Return the search backend name for the database behind a queryset"""
+    vendor = connections[queryset.db].vendor
+    if vendor in ('sqlite', 'postgresql'):
+        return vendor
+    return 'fallback'
+
+
+def build_fts_query(search_term):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every whitespace separated word becomes a quoted phrase so user input can
+    never produce an FTS5 syntax error. A trailing ``*`` is kept as a prefix
+    query, e.g. ``temp*`` matches ``temperature``.
+    """
+    terms = []
+    for word in search_term.split():
+        prefix = word.endswith('*') and len(word) > 1
+        word = word.rstrip('*').replace('"', '""')
+        if not word:
+            continue
+        terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return ' '.join(terms)
+
+
+def search_messages(queryset, search_term, topic_prefix=None):
+    """
+    Filter ``queryset`` to messages matching ``search_term``.
+
+    Results are annotated with ``search_rank``; lower values are better
+    matches on every backend, so callers can always order by ``search_rank``.
+    """
+    backend = search_backend(queryset)
+
+    if topic_prefix:
+        queryset = queryset.filter(topic_prefix_q(topic_prefix, backend))
+
+    search_term = search_term.strip()
+    if not search_term:
+        return queryset
+
+    if backend == 'sqlite':
+        fts_query = build_fts_query(search_term)
+        if not fts_query:
+            return queryset
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'"{FTS_TABLE}".rowid = "mqtt_service_mqttmessage"."id"',
+                f'"{FTS_TABLE}" MATCH %s',
+            ],
+            params=[fts_query],
+            select={'search_rank': f'"{FTS_TABLE}".rank'},
+        )
+
+    if backend == 'postgresql':
+        return queryset.extra(
+            where=[f"{PG_TSVECTOR} @@ websearch_to_tsquery('simple', %s)"],
+            params=[search_term],
+            select={
+                'search_rank': f"-ts_rank({PG_TSVECTOR}, websearch_to_tsquery('simple', %s))"},
+            select_params=[search_term],
+        )
+
+    condition = Q()
+    for word in search_term.split():
+        condition &= Q(topic__icontains=word) | Q(payload__icontains=word)
+    return queryset.filter(condition).annotate(
+        search_rank=Value(0.0, output_field=FloatField()))
+
+
+def create_search_index(schema_editor):
+    """Create the full-text index for the current database"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = [
+            f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                topic, payload,
+                content='mqtt_service_mqttmessage', content_rowid='id'
+            )""",
+            f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+                AFTER INSERT ON mqtt_service_mqttmessage BEGIN
+                    INSERT INTO {FTS_TABLE}(rowid, topic, payload)
+                    VALUES (new.id, new.topic, new.payload);
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+                AFTER DELETE ON mqtt_service_mqttmessage BEGIN
+                    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, topic, payload)
+                    VALUES ('delete', old.id, old.topic, old.payload);
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+                AFTER UPDATE OF topic, payload ON mqtt_service_mqttmessage BEGIN
+                    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, topic, payload)
+                    VALUES ('delete', old.id, old.topic, old.payload);
+                    INSERT INTO {FTS_TABLE}(rowid, topic, payload)
+                    VALUES (new.id, new.topic, new.payload);
+                END""",
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+        ]
+    elif vendor == 'postgresql':
+        statements = [
+            f"""CREATE INDEX IF NOT EXISTS {FTS_TABLE}_idx
+                ON mqtt_service_mqttmessage USING GIN ({PG_TSVECTOR})""",
+        ]
+    else:
+        statements = []
+
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(schema_editor):
+    """Drop the full-text index for the current database"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = [
+            f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+            f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+            f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+            f"DROP TABLE IF EXISTS {FTS_TABLE}",
+        ]
+    elif vendor == 'postgresql':
+        statements = [f"DROP INDEX IF EXISTS {FTS_TABLE}_idx"]
+    else:
+        statements = []
+
+    for statement in statements:
+        schema_editor.execute(statement)
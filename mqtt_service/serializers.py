@@ -1,17 +1,100 @@
 """
 Serializers for MQTT Service API
 """
+from django.db.models import TextField
+from django.db.models.functions import Cast
 from rest_framework import serializers
-from .models import MQTTMessage, MQTTConnection
+from .models import (
+    MQTTMessage, MQTTMessageAggregate, QuarantinedMessage, MQTTConnection,
+    AcknowledgeJob, ReplayJob, ShedSummary,
+)
+from .processing import DEFAULT_CHUNK_SIZE
+from .renderers import RawJSON, dumps
+from .topics import validate_topic_filter
 
 
 class MQTTMessageSerializer(serializers.ModelSerializer):
     """Serializer for MQTT Messages"""
     class Meta:
         model = MQTTMessage
-        fields = ['id', 'topic', 'payload', 'qos',
+        fields = ['id', 'topic', 'payload', 'decoded', 'qos',
                   'retain', 'timestamp', 'processed']
-        read_only_fields = ['id', 'timestamp']
+        read_only_fields = ['id', 'decoded', 'timestamp']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class MessageRowSerializer:
+    """
+    Lightweight read-only serializer for large lists of MQTT messages.
+
+    Reads rows with ``.values()`` instead of building model instances and
+    encodes each row with one ``dumps`` call instead of running a DRF field
+    per value. ``decoded`` is selected as JSON text and embedded raw. Output
+    matches MQTTMessageSerializer for the selected fields.
+    """
+    RAW_JSON_FIELDS = {'decoded'}
+
+    def __init__(self, fields=None):
+        self.fields = list(fields or MQTTMessageSerializer.Meta.fields)
+        self.columns = [name for name in self.fields
+                        if name not in self.RAW_JSON_FIELDS]
+        self.raw_fields = [name for name in self.fields
+                           if name in self.RAW_JSON_FIELDS]
+
+    def values(self, queryset):
+        """Return ``queryset`` as a values() queryset of the selected fields"""
+        raw = {f'{name}_json': Cast(name, TextField()) for name in self.raw_fields}
+        return queryset.values(*self.columns, **raw)
+
+    def encode_row(self, row):
+        """Encode one row from ``values()`` as JSON bytes"""
+        if not self.raw_fields:
+            return dumps(row)
+        parts = []
+        for name in self.raw_fields:
+            value = row.pop(f'{name}_json')
+            parts.append(b'"%s":%s' % (name.encode('ascii'),
+                                       b'null' if value is None else value.encode('utf-8')))
+        body = dumps(row)
+        if body != b'{}':
+            parts.append(body[1:-1])
+        return b'{' + b','.join(parts) + b'}'
+
+    def render(self, rows):
+        """Encode rows as a RawJSON array"""
+        if not self.raw_fields:
+            return RawJSON(dumps(list(rows)))
+        return RawJSON(b'[' + b','.join(map(self.encode_row, rows)) + b']')
+
+
+class QuarantinedMessageSerializer(serializers.ModelSerializer):
+    """Serializer for messages that failed their payload schema"""
+    class Meta:
+        model = QuarantinedMessage
+        fields = ['id', 'topic', 'payload', 'qos', 'retain',
+                  'schema_topic', 'error', 'timestamp']
+        read_only_fields = fields
+
+
+class MQTTMessageAggregateSerializer(serializers.ModelSerializer):
+    """Serializer for aggregated message windows"""
+    class Meta:
+        model = MQTTMessageAggregate
+        fields = ['id', 'topic', 'window_start', 'window_end', 'count', 'fields']
+        read_only_fields = fields
+
+
+class ShedSummarySerializer(serializers.ModelSerializer):
+    """Serializer for counts of messages shed by aggregate rate limits"""
+    class Meta:
+        model = ShedSummary
+        fields = ['id', 'topic', 'rule_topic', 'count', 'last_payload', 'timestamp']
+        read_only_fields = fields
 
 
 class MQTTConnectionSerializer(serializers.ModelSerializer):
@@ -21,3 +104,71 @@ class MQTTConnectionSerializer(serializers.ModelSerializer):
         fields = ['id', 'client_id', 'status', 'last_connected', 'last_disconnected',
                   'error_message', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class AcknowledgeSerializer(serializers.Serializer):
+    """Serializer for bulk mark-processed requests"""
+    topic = serializers.CharField(required=False)
+    topic_filter = serializers.CharField(
+        required=False, validators=[validate_topic_filter])
+    id_from = serializers.IntegerField(required=False, min_value=1)
+    id_to = serializers.IntegerField(required=False, min_value=1)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    chunk_size = serializers.IntegerField(
+        required=False, min_value=1, max_value=100000, default=DEFAULT_CHUNK_SIZE)
+    run_async = serializers.BooleanField(required=False, default=False)
+
+    CRITERIA_FIELDS = ['topic', 'topic_filter',
+                       'id_from', 'id_to', 'since', 'until']
+
+    def validate(self, attrs):
+        if not any(field in attrs for field in self.CRITERIA_FIELDS):
+            raise serializers.ValidationError(
+                f"At least one of {', '.join(self.CRITERIA_FIELDS)} is required")
+        return attrs
+
+    def get_criteria(self):
+        """Return the validated criteria as JSON-serializable values"""
+        criteria = {}
+        for field in self.CRITERIA_FIELDS:
+            if field in self.validated_data:
+                value = self.validated_data[field]
+                criteria[field] = value.isoformat() if hasattr(
+                    value, 'isoformat') else value
+        return criteria
+
+
+class AcknowledgeJobSerializer(serializers.ModelSerializer):
+    """Serializer for bulk mark-processed job progress"""
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AcknowledgeJob
+        fields = ['id', 'criteria', 'chunk_size', 'status', 'total_count',
+                  'updated_count', 'progress', 'last_id', 'error_message',
+                  'created_at', 'updated_at', 'finished_at']
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        if obj.status == 'completed':
+            return 1.0
+        if not obj.total_count:
+            return 0.0
+        return round(min(obj.updated_count / obj.total_count, 1.0), 4)
+
+
+class ReplayJobSerializer(serializers.ModelSerializer):
+    """Serializer for message replay jobs"""
+    topic_filter = serializers.CharField(
+        max_length=255, validators=[validate_topic_filter])
+    speed = serializers.FloatField(required=False, min_value=0.001)
+
+    class Meta:
+        model = ReplayJob
+        fields = ['id', 'topic_filter', 'since', 'until', 'mode', 'speed',
+                  'target_prefix', 'status', 'last_id', 'max_id', 'published_count',
+                  'error_message', 'created_at', 'updated_at', 'finished_at']
+        read_only_fields = ['id', 'status', 'last_id', 'max_id', 'published_count',
+                            'error_message', 'created_at', 'updated_at',
+                            'finished_at']
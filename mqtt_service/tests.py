@@ -0,0 +1,503 @@
+"""
+Tests for MQTT Service
+"""
+import datetime
+import math
+import re
+import struct
+import threading
+import time
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from webhook_receiver import WebhookReceiver
+from .aggregation import WindowAggregator
+from .decoders import PayloadDecoder, PayloadError, compile_decoder, compile_schema
+from .forwarding import ForwardingStage
+from .ingest import IngestPipeline
+from .models import MQTTMessage, QuarantinedMessage, ReplayJob
+from .ratelimit import TokenBucket, TopicRateLimiter
+from .replay import run_replay_job
+from .topics import TopicRuleCache, topic_filter_q, topic_filter_regex, topic_matches, topic_prefix_q
+
+
+def build_messages(count, topic='sensors/{}/telemetry'):
+    now = timezone.now()
+    return [MQTTMessage(id=i + 1, topic=topic.format(i % 3), payload=f'{{"seq": {i}}}',
+                        decoded={'seq': i}, qos=0, retain=False, timestamp=now)
+            for i in range(count)]
+
+
+# (filter, topic, matches) cases shared by the regex, Q and API tests
+TOPIC_FILTER_CASES = [
+    ('a/+/c', 'a/b/c', True),
+    ('a/+/c', 'a//c', True),
+    ('a/+/c', 'a/b/d/c', False),
+    ('a/+', 'a/', True),
+    ('a/+', 'a', False),
+    ('+/b', '/b', True),
+    ('a/#', 'a', True),
+    ('a/#', 'a/b/c', True),
+    ('a/#', 'ab', False),
+    ('a/#', 'a0', False),
+    ('#', 'a/b', True),
+    ('#', '$SYS/uptime', False),
+    ('+/uptime', '$SYS/uptime', False),
+    ('$SYS/#', '$SYS/uptime', True),
+    ('a.b/+', 'a.b/c', True),
+    ('a.b/+', 'aXb/c', False),
+    ('a/b', 'a/b', True),
+    ('a/b', 'a/b/c', False),
+]
+
+
+class TopicFilterTests(SimpleTestCase):
+    """MQTT wildcard semantics of the in-process matchers"""
+
+    def test_topic_matches(self):
+        for topic_filter, topic, expected in TOPIC_FILTER_CASES:
+            with self.subTest(topic_filter=topic_filter, topic=topic):
+                self.assertIs(topic_matches(topic_filter, topic), expected)
+
+    def test_topic_filter_regex(self):
+        for topic_filter, topic, expected in TOPIC_FILTER_CASES:
+            with self.subTest(topic_filter=topic_filter, topic=topic):
+                match = re.match(topic_filter_regex(topic_filter), topic)
+                self.assertIs(match is not None, expected)
+
+    def test_topic_rule_cache(self):
+        rules = [('sensors/+/raw', 'raw'), ('sensors/#', 'sensors'), ('#', 'all')]
+        first = TopicRuleCache(rules[:2], default='none', max_size=2)
+        self.assertEqual(first.get('sensors/1/raw'), 'raw')
+        self.assertEqual(first.get('sensors/1'), 'sensors')
+        self.assertEqual(first.get('other'), 'none')
+        self.assertEqual(list(first._topics), ['other'])
+
+        every = TopicRuleCache(rules, all_matches=True)
+        self.assertEqual(every.get('sensors/1/raw'), ('raw', 'sensors', 'all'))
+        self.assertEqual(every.get('$SYS/uptime'), ())
+
+
+class TopicQueryTests(TestCase):
+    """Database lookups and the ?topic_filter= API filter"""
+
+    topics = sorted({topic for _, topic, _ in TOPIC_FILTER_CASES} | {'a.', 'a/', 'a/\uffff'})
+
+    def setUp(self):
+        MQTTMessage.objects.bulk_create(
+            [MQTTMessage(topic=topic, payload='1') for topic in self.topics])
+
+    def expected(self, topic_filter):
+        return {topic for topic in self.topics if topic_matches(topic_filter, topic)}
+
+    def test_topic_filter_q(self):
+        for topic_filter in {topic_filter for topic_filter, _, _ in TOPIC_FILTER_CASES}:
+            with self.subTest(topic_filter=topic_filter):
+                matched = MQTTMessage.objects.filter(topic_filter_q(topic_filter, 'sqlite'))
+                self.assertEqual(set(matched.values_list('topic', flat=True)),
+                                 self.expected(topic_filter))
+
+    def test_topic_prefix_q_upper_bound(self):
+        # 'a/' scans ['a/', 'a0'): '0' is the character after '/'
+        self.assertEqual(topic_prefix_q('a/', 'sqlite'), Q(topic__gte='a/', topic__lt='a0'))
+        matched = MQTTMessage.objects.filter(topic_prefix_q('a/', 'sqlite'))
+        self.assertEqual(set(matched.values_list('topic', flat=True)),
+                         {topic for topic in self.topics if topic.startswith('a/')})
+        self.assertEqual(topic_prefix_q('a/', 'postgresql'), Q(topic__startswith='a/'))
+
+    def test_api_topic_filter(self):
+        for topic_filter in ('a/+/c', 'a/#', '#', '+/uptime'):
+            with self.subTest(topic_filter=topic_filter):
+                response = self.client.get(
+                    '/api/messages/', {'topic_filter': topic_filter, 'page_size': 100})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual({message['topic'] for message in response.json()['results']},
+                                 self.expected(topic_filter))
+
+    def test_api_rejects_invalid_filters(self):
+        for topic_filter in ('a/b#', 'a/#/c', 'a+/b'):
+            with self.subTest(topic_filter=topic_filter):
+                response = self.client.get('/api/messages/', {'topic_filter': topic_filter})
+                self.assertEqual(response.status_code, 400)
+
+
+class WindowAggregatorTests(SimpleTestCase):
+    """Tumbling windows of MQTT_AGGREGATIONS topics"""
+
+    def aggregator(self, **rule):
+        return WindowAggregator([{'topic': 'sensors/#', 'window': 10, **rule}])
+
+    def test_window_boundaries(self):
+        aggregator = self.aggregator()
+        self.assertEqual(aggregator.add('sensors/1', b'{"temp": 1}', 100), [])
+        self.assertEqual(aggregator.add('sensors/1', b'{"temp": 3}', 109.999), [])
+        self.assertEqual(aggregator.close_windows(109.999), [])
+
+        closed = aggregator.add('sensors/1', b'{"temp": 5}', 110)
+        self.assertEqual(len(closed), 1)
+        summary = closed[0]
+        self.assertEqual((summary.window_start.timestamp(), summary.window_end.timestamp()),
+                         (100, 110))
+        self.assertEqual(summary.count, 2)
+        self.assertEqual(summary.fields['temp'],
+                         {'count': 2, 'min': 1.0, 'max': 3.0, 'mean': 2.0, 'last': 3.0})
+
+        self.assertEqual(aggregator.close_windows(119.9), [])
+        closed = aggregator.close_windows(120)
+        self.assertEqual([(summary.window_start.timestamp(), summary.count)
+                          for summary in closed], [(110, 1)])
+        self.assertEqual(aggregator.close_windows(1000), [])
+
+    def test_force_closes_open_windows(self):
+        aggregator = self.aggregator()
+        aggregator.add('sensors/1', b'{"temp": 1}', 100)
+        aggregator.add('sensors/2', b'{"temp": 2}', 105)
+        self.assertEqual(aggregator.close_windows(101), [])
+        self.assertEqual(sorted(summary.topic for summary in
+                                aggregator.close_windows(101, force=True)),
+                         ['sensors/1', 'sensors/2'])
+
+    def test_raw_fallback(self):
+        aggregator = self.aggregator()
+        self.assertIs(aggregator.add('other', b'{"temp": 1}', 100), False)
+        for payload in (b'[1, 2]', b'21.5', b'not json', b'{"a": ' * 100000):
+            with self.subTest(payload=payload[:20]):
+                self.assertIs(aggregator.add('sensors/1', payload, 100), False)
+        self.assertEqual(aggregator.close_windows(0, force=True), [])
+
+    def test_unrepresentable_numbers_are_skipped(self):
+        aggregator = self.aggregator()
+        payload = '{"big": %d, "inf": 1e999, "max": 1.7e308, "flag": true}' % 10 ** 400
+        aggregator.add('sensors/1', payload.encode(), 100)
+        aggregator.add('sensors/1', b'{"max": 1.7e308}', 101)
+        summary, = aggregator.close_windows(0, force=True)
+        self.assertEqual(summary.count, 2)
+        self.assertEqual(set(summary.fields), {'max'})
+        # The sum overflows, the mean does not
+        self.assertEqual(summary.fields['max']['mean'], 1.7e308)
+
+    def test_fields_selection(self):
+        aggregator = self.aggregator(fields=['temp', 'env.humidity'])
+        aggregator.add('sensors/1',
+                       b'{"temp": 1, "seq": 7, "env": {"humidity": 40, "pressure": 1000}}', 100)
+        summary, = aggregator.close_windows(0, force=True)
+        self.assertEqual(set(summary.fields), {'temp', 'env.humidity'})
+
+
+class PayloadDecoderTests(SimpleTestCase):
+    """Schema compilation, payload formats and topic rules"""
+
+    schema = {
+        'type': 'object',
+        'required': ['temp'],
+        'additionalProperties': False,
+        'properties': {
+            'temp': {'type': 'number', 'minimum': -40, 'maximum': 125},
+            'unit': {'enum': ['C', 'F']},
+            'name': {'type': 'string', 'minLength': 1, 'maxLength': 8},
+            'tags': {'type': 'array', 'items': {'type': 'string'}},
+            'count': {'type': ['integer', 'null']},
+        },
+    }
+
+    def test_schema_validation(self):
+        validate = compile_schema(self.schema)
+        validate({'temp': 21.5, 'unit': 'C', 'name': 'probe', 'tags': ['a'], 'count': None})
+        invalid = [
+            ([], '$: expected object'),
+            ({}, "missing required property 'temp'"),
+            ({'temp': '21'}, '$.temp: expected number'),
+            ({'temp': True}, '$.temp: expected number'),
+            ({'temp': 200}, '$.temp: 200 is greater than 125'),
+            ({'temp': -41}, '$.temp: -41 is less than -40'),
+            ({'temp': 1, 'unit': 'K'}, "$.unit: 'K' is not one of"),
+            ({'temp': 1, 'name': ''}, '$.name: string length 0'),
+            ({'temp': 1, 'name': 'x' * 9}, '$.name: string length 9'),
+            ({'temp': 1, 'tags': ['a', 1]}, '$.tags[]: expected string'),
+            ({'temp': 1, 'count': 1.5}, '$.count: expected integer or null'),
+            ({'temp': 1, 'extra': 1}, "unexpected property 'extra'"),
+        ]
+        for value, error in invalid:
+            with self.subTest(value=value):
+                with self.assertRaisesRegex(PayloadError, re.escape(error)):
+                    validate(value)
+
+    def test_invalid_rules(self):
+        for rule in ({'schema': {'type': 'decimal'}},
+                     {'format': 'struct'},
+                     {'format': 'struct', 'struct': '<qZ'},
+                     {'format': 'struct', 'struct': '<fH', 'fields': ['temp']},
+                     {'format': 'xml'}):
+            with self.subTest(rule=rule), self.assertRaises(ImproperlyConfigured):
+                compile_decoder(rule)
+
+    def test_json_rejects_non_finite_numbers(self):
+        decode = compile_decoder({'format': 'json'})
+        self.assertEqual(decode(b'{"temp": 1.5e3}'), {'temp': 1500.0})
+        for payload in (b'{"temp": NaN}', b'[Infinity]', b'-Infinity', b'1e999', b'{"temp": '):
+            with self.subTest(payload=payload), self.assertRaises(PayloadError):
+                decode(payload)
+
+    def test_deeply_nested_json_is_a_payload_error(self):
+        decode = compile_decoder({'format': 'json'})
+        with self.assertRaises(PayloadError):
+            decode(b'[' * 100000 + b']' * 100000)
+
+    def test_struct_field_mapping(self):
+        decode = compile_decoder({'format': 'struct', 'struct': '<fHI4s',
+                                  'fields': ['temp', 'humidity', 'seq', 'id']})
+        self.assertEqual(decode(struct.pack('<fHI4s', 1.5, 40, 7, b'ab\xff\x00')),
+                         {'temp': 1.5, 'humidity': 40, 'seq': 7, 'id': 'ab\ufffd\x00'})
+        self.assertEqual(compile_decoder({'format': 'struct', 'struct': '<HH'})(
+            struct.pack('<HH', 1, 2)), [1, 2])
+        with self.assertRaisesRegex(PayloadError, 'Invalid struct payload'):
+            decode(b'short')
+        with self.assertRaisesRegex(PayloadError, 'not a finite number'):
+            decode(struct.pack('<fHI4s', math.nan, 0, 0, b''))
+
+    def test_first_matching_rule_wins(self):
+        decoder = PayloadDecoder([
+            {'topic': 'sensors/+/raw', 'format': 'struct', 'struct': '<H'},
+            {'topic': 'sensors/#', 'schema': {'type': 'object'}},
+        ])
+        self.assertEqual(decoder.rule_for('sensors/1/raw')[0], 'sensors/+/raw')
+        self.assertEqual(decoder.rule_for('sensors/1/json')[0], 'sensors/#')
+        self.assertIsNone(decoder.rule_for('other'))
+        with self.assertRaises(ImproperlyConfigured):
+            PayloadDecoder([{'topic': 'sensors/#/raw'}])
+
+
+class IngestWriteTests(TestCase):
+    """Decoding, quarantine and insert bisection in the ingest writer"""
+
+    def setUp(self):
+        self.pipeline = IngestPipeline.get_instance()
+        decoder = PayloadDecoder([{'topic': 'sensors/#', 'schema': {
+            'type': 'object', 'required': ['temp']}}])
+        patcher = mock.patch('mqtt_service.ingest.payload_decoder', decoder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_build_messages_quarantines_invalid_payloads(self):
+        batch = [(topic, payload, 1, False, time.time()) for topic, payload in (
+            ('sensors/1', b'{"temp": 21}'),
+            ('sensors/2', b'{"humidity": 40}'),
+            ('sensors/3', b'NaN'),
+            ('other', b'not json'),
+        )]
+        messages, quarantined = self.pipeline.build_messages(batch)
+
+        self.assertEqual([(message.topic, message.decoded) for message in messages],
+                         [('sensors/1', {'temp': 21}), ('other', None)])
+        self.assertEqual([(message.topic, message.schema_topic, message.payload)
+                          for message in quarantined],
+                         [('sensors/2', 'sensors/#', '{"humidity": 40}'),
+                          ('sensors/3', 'sensors/#', 'NaN')])
+        self.assertIn("missing required property 'temp'", quarantined[0].error)
+
+    def test_insert_rows_leaves_out_only_rejected_rows(self):
+        rows = [MQTTMessage(topic=f'sensors/{i}', payload=str(i)) for i in range(10)]
+        rows[3].topic = None
+        rows[8].topic = None
+        stored, rejected = self.pipeline.insert_rows(MQTTMessage, rows)
+
+        self.assertEqual([row.payload for row in stored],
+                         ['0', '1', '2', '4', '5', '6', '7', '9'])
+        self.assertEqual([row.payload for row, _ in rejected], ['3', '8'])
+        self.assertEqual(sorted(MQTTMessage.objects.values_list('payload', flat=True)),
+                         ['0', '1', '2', '4', '5', '6', '7', '9'])
+        self.assertTrue(all(row.pk is None for row, _ in rejected))
+
+    def test_write_batch_stores_and_quarantines(self):
+        batch = [('sensors/1', b'{"temp": 21}', 0, False, time.time()),
+                 ('sensors/2', b'{}', 0, False, time.time())]
+        self.pipeline.write_batch(batch)
+
+        self.assertEqual(list(MQTTMessage.objects.values_list('topic', flat=True)),
+                         ['sensors/1'])
+        self.assertEqual(list(QuarantinedMessage.objects.values_list('topic', flat=True)),
+                         ['sensors/2'])
+
+
+class RateLimitTests(SimpleTestCase):
+    """Token buckets and shedding actions, on a fake clock"""
+
+    def allowed(self, limiter, topic, count, now, payload=b'1'):
+        return [limiter.allow(topic, payload, now) for _ in range(count)]
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=2, burst=3, now=100)
+        self.assertEqual([bucket.consume(100) for _ in range(4)], [True, True, True, False])
+        self.assertTrue(bucket.consume(100.5))
+        self.assertFalse(bucket.consume(100.5))
+        # Refill is capped at the burst size
+        self.assertEqual([bucket.consume(200) for _ in range(4)], [True, True, True, False])
+
+    def test_drop_per_topic(self):
+        limiter = TopicRateLimiter([{'topic': 'sensors/#', 'rate': 1, 'burst': 2}])
+        self.assertEqual(self.allowed(limiter, 'sensors/1', 3, 0), [True, True, False])
+        self.assertEqual(self.allowed(limiter, 'sensors/2', 3, 0), [True, True, False])
+        self.assertEqual(self.allowed(limiter, 'sensors/1', 2, 1), [True, False])
+        self.assertEqual(self.allowed(limiter, 'other', 5, 0), [True] * 5)
+
+    def test_shared_bucket(self):
+        limiter = TopicRateLimiter([{'topic': 'sensors/#', 'rate': 1, 'burst': 2,
+                                     'per_topic': False}])
+        self.assertEqual(self.allowed(limiter, 'sensors/1', 1, 0), [True])
+        self.assertEqual(self.allowed(limiter, 'sensors/2', 2, 0), [True, False])
+
+    def test_sample(self):
+        limiter = TopicRateLimiter([{'topic': 'sensors/#', 'rate': 1, 'burst': 1,
+                                     'action': 'sample', 'sample_rate': 0.25}])
+        self.assertEqual(self.allowed(limiter, 'sensors/1', 9, 0),
+                         [True, False, False, False, True, False, False, False, True])
+
+    def test_aggregate_and_drain(self):
+        limiter = TopicRateLimiter([{'topic': 'sensors/#', 'rate': 1, 'burst': 1,
+                                     'action': 'aggregate'}])
+        self.assertEqual(self.allowed(limiter, 'sensors/1', 3, 0), [True, False, False])
+        limiter.allow('sensors/1', b'last', 0)
+        limiter.allow('sensors/2', b'first', 0)
+        limiter.allow('sensors/2', b'\xff', 0)
+
+        summaries = {summary.topic: summary for summary in limiter.drain_aggregates()}
+        self.assertEqual(set(summaries), {'sensors/1', 'sensors/2'})
+        self.assertEqual((summaries['sensors/1'].count, summaries['sensors/1'].last_payload,
+                          summaries['sensors/1'].rule_topic), (3, 'last', 'sensors/#'))
+        self.assertEqual((summaries['sensors/2'].count, summaries['sensors/2'].last_payload),
+                         (1, "b'\\xff'"))
+        self.assertEqual(limiter.drain_aggregates(), [])
+
+    def test_least_recently_seen_topic_is_evicted(self):
+        limiter = TopicRateLimiter([{'topic': 'sensors/#', 'rate': 1, 'burst': 1}])
+        with mock.patch('mqtt_service.ratelimit.MAX_CACHED_TOPICS', 2):
+            self.assertEqual(self.allowed(limiter, 'sensors/a', 2, 0), [True, False])
+            self.assertEqual(self.allowed(limiter, 'sensors/b', 2, 0), [True, False])
+            self.allowed(limiter, 'sensors/a', 1, 0)
+            self.allowed(limiter, 'sensors/c', 1, 0)
+            self.assertEqual(list(limiter._topics), ['sensors/a', 'sensors/c'])
+            # 'a' kept its empty bucket, 'b' starts over with a full one
+            self.assertEqual(self.allowed(limiter, 'sensors/a', 1, 0), [False])
+            self.assertEqual(self.allowed(limiter, 'sensors/b', 1, 0), [True])
+
+    def test_invalid_rules(self):
+        for rule in ({'topic': 'a/#/b', 'rate': 1},
+                     {'topic': 'a', 'rate': 0},
+                     {'topic': 'a', 'rate': 1, 'action': 'queue'},
+                     {'topic': 'a', 'rate': 1, 'sample_rate': 2}):
+            with self.subTest(rule=rule), self.assertRaises(ImproperlyConfigured):
+                TopicRateLimiter([rule])
+
+
+class WebhookForwardingTests(SimpleTestCase):
+    """An "http" forwarder delivering to WebhookReceiver"""
+
+    def start_receiver(self, fail_every=0):
+        server = WebhookReceiver(('127.0.0.1', 0), fail_every)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def forward(self, server, messages, **options):
+        config = {'name': 'test', 'type': 'http', 'batch_size': 10, 'flush_interval': 0.05,
+                  'url': f'http://127.0.0.1:{server.server_address[1]}/hook', **options}
+        stage = ForwardingStage([config])
+        forwarder = stage.forwarders[0]
+        stage.start()
+        self.addCleanup(stage.stop)
+        for offset in range(0, len(messages), 10):
+            stage.forward(messages[offset:offset + 10])
+
+        deadline = time.monotonic() + 10
+        stats = forwarder.stats
+        while stats['delivered'] + stats['failed'] + stats['dropped'] < stats['queued']:
+            self.assertLess(time.monotonic(), deadline, 'forwarder did not finish')
+            time.sleep(0.01)
+        return forwarder
+
+    def test_delivers_gzip_batches_over_one_connection(self):
+        server = self.start_receiver()
+        forwarder = self.forward(server, build_messages(50))
+
+        self.assertEqual(forwarder.stats['delivered'], 50)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(server.batches, 5)
+        self.assertEqual(sorted(message['id'] for message in server.messages),
+                         list(range(1, 51)))
+        self.assertEqual(server.messages[0]['decoded'], {'seq': 0})
+
+    def test_retries_failed_requests(self):
+        server = self.start_receiver(fail_every=3)
+        forwarder = self.forward(server, build_messages(50), gzip=False, max_retries=3)
+
+        self.assertEqual(forwarder.stats['failed'], 0)
+        self.assertGreater(forwarder.stats['retries'], 0)
+        self.assertEqual(len({message['id'] for message in server.messages}), 50)
+
+    def test_only_matching_topics_are_forwarded(self):
+        server = self.start_receiver()
+        messages = build_messages(30)
+        forwarder = self.forward(server, messages, topics=['sensors/1/#'])
+
+        self.assertEqual(forwarder.stats['delivered'], 10)
+        self.assertEqual({message['topic'] for message in server.messages},
+                         {'sensors/1/telemetry'})
+
+
+class ReplayTests(TestCase):
+    """run_replay_job paging and range bounds"""
+
+    def test_republished_copies_are_not_replayed(self):
+        MQTTMessage.objects.bulk_create(
+            [MQTTMessage(topic=f'mqtt/poc/{i}', payload=str(i)) for i in range(25)])
+        job = ReplayJob.objects.create(topic_filter='mqtt/poc/#')
+        published = []
+
+        def publish(topic, payload, qos, retain):
+            # Without target_prefix the broker delivers copies back to ingest
+            published.append(payload)
+            MQTTMessage.objects.create(topic=topic, payload=payload)
+            return True
+
+        with mock.patch('mqtt_service.replay.PAGE_SIZE', 10):
+            run_replay_job(job, publish=publish)
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(published, [str(i) for i in range(25)])
+        self.assertEqual(job.max_id, job.last_id)
+
+
+class MessageAdminTests(TestCase):
+    """The message changelist date hierarchy"""
+
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(user)
+        for day in (datetime.datetime(2024, 11, 30, 12), datetime.datetime(2025, 2, 3, 12)):
+            message = MQTTMessage.objects.create(topic='sensors/1/telemetry', payload='1')
+            MQTTMessage.objects.filter(pk=message.pk).update(
+                timestamp=timezone.make_aware(day))
+
+    def changelist(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/mqtt_service/mqttmessage/', params)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            self.assertNotIn('DISTINCT', query['sql'])
+        return [choice['title'] for choice in response.context['choices']]
+
+    def test_levels_come_from_the_bounds(self):
+        self.assertEqual(self.changelist(), ['2024', '2025'])
+        # Empty months between the bounds are listed too
+        self.assertEqual(self.changelist(timestamp__year=2024),
+                         ['November 2024', 'December 2024'])
+        self.assertEqual(self.changelist(timestamp__year=2025),
+                         ['January 2025', 'February 2025'])
+        self.assertEqual(len(self.changelist(timestamp__year=2024, timestamp__month=11)), 1)
+        self.assertEqual(len(self.changelist(timestamp__year=2025, timestamp__month=2)), 3)
@@ -0,0 +1,182 @@
+"""
+MQTT topic filter helpers
+
+Translate MQTT subscription filters (``+`` and ``#`` wildcards) into
+index-friendly database lookups and fast in-process matchers.
+"""
+import re
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+TOPIC_LIST_CACHE_KEY = 'mqtt_service:topics'
+
+# Topics remembered by a TopicRuleCache before it starts over
+MAX_CACHED_TOPICS = 100000
+
+
+def validate_topic_filter(topic_filter):
+    """Raise ValidationError if ``topic_filter`` is not a valid MQTT filter"""
+    if not topic_filter:
+        raise ValidationError('Topic filter must not be empty.')
+    levels = topic_filter.split('/')
+    for index, level in enumerate(levels):
+        if '#' in level and (level != '#' or index != len(levels) - 1):
+            raise ValidationError(
+                "'#' must occupy a whole level and be the last level.")
+        if '+' in level and level != '+':
+            raise ValidationError("'+' must occupy a whole level.")
+
+
+def split_topic_filter(topic_filter):
+    """
+    Split a filter into its literal prefix and the remaining levels.
+
+    ``mqtt/poc/+/temp`` -> (``mqtt/poc/``, [``+``, ``temp``])
+    """
+    levels = topic_filter.split('/')
+    for index, level in enumerate(levels):
+        if level in ('+', '#'):
+            prefix = '/'.join(levels[:index])
+            return (prefix + '/' if index else ''), levels[index:]
+    return topic_filter, []
+
+
+@lru_cache(maxsize=1024)
+def topic_filter_regex(topic_filter):
+    """Return an anchored regular expression equivalent to ``topic_filter``"""
+    levels = topic_filter.split('/')
+    parts = []
+    for level in levels:
+        if level == '+':
+            parts.append('[^/]*')
+        elif level == '#':
+            parts.append('.*')
+        else:
+            parts.append(re.escape(level))
+    pattern = '/'.join(parts)
+    if levels[-1] == '#':
+        # 'a/#' also matches the parent level 'a'
+        pattern = pattern[:-len('/.*')] + '(/.*)?' if len(levels) > 1 else '.*'
+    if levels[0] in ('+', '#'):
+        # Wildcards in the first level never match system topics
+        pattern = r'(?!\$)' + pattern
+    return '^' + pattern + '$'
+
+
+@lru_cache(maxsize=4096)
+def _compiled(topic_filter):
+    return re.compile(topic_filter_regex(topic_filter))
+
+
+def topic_matches(topic_filter, topic):
+    """Return True if ``topic`` matches the MQTT ``topic_filter``"""
+    if '+' not in topic_filter and '#' not in topic_filter:
+        return topic_filter == topic
+    return _compiled(topic_filter).match(topic) is not None
+
+
+class TopicRuleCache:
+    """
+    Memoized lookup of the rules whose topic filter matches a topic.
+
+    ``rules`` are ``(topic filter, value)`` pairs in priority order. ``get``
+    returns the value of the first matching rule, or ``default``; with
+    ``all_matches`` it returns a tuple of the values of every match. The
+    result is cached per topic, and the cache is cleared once it holds
+    ``max_size`` topics so floods of one-off topics can't grow it unbounded.
+    """
+
+    def __init__(self, rules, default=None, all_matches=False, max_size=MAX_CACHED_TOPICS):
+        self.rules = list(rules)
+        self.default = default
+        self.all_matches = all_matches
+        self.max_size = max_size
+        self._topics = {}
+
+    def get(self, topic):
+        try:
+            return self._topics[topic]
+        except KeyError:
+            pass
+        if len(self._topics) >= self.max_size:
+            self._topics.clear()
+        matches = (value for topic_filter, value in self.rules
+                   if topic_matches(topic_filter, topic))
+        if self.all_matches:
+            result = tuple(matches)
+        else:
+            result = next(matches, self.default)
+        self._topics[topic] = result
+        return result
+
+
+def topic_prefix_q(prefix, vendor):
+    """
+    Build an index-friendly ``Q`` for topics starting with ``prefix``.
+
+    SQLite compares text with the BINARY collation, so a half-open range scan
+    on ``topic`` is exact and can use the ``(topic, -timestamp)`` index.
+    Elsewhere collation may be locale aware, so ``startswith`` is used and
+    served by the ``varchar_pattern_ops`` index on PostgreSQL.
+    """
+    if vendor == 'sqlite':
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return Q(topic__gte=prefix, topic__lt=upper)
+    return Q(topic__startswith=prefix)
+
+
+def topic_filter_q(topic_filter, vendor):
+    """
+    Translate an MQTT topic filter into a ``Q`` object.
+
+    The literal prefix before the first wildcard becomes a prefix range scan
+    on the topic index; only rows inside that range are checked against the
+    regular expression for the remaining levels.
+    """
+    prefix, rest = split_topic_filter(topic_filter)
+    if not rest:
+        return Q(topic=topic_filter)
+
+    if rest == ['#']:
+        if not prefix:
+            return ~Q(topic__startswith='$')
+        # 'a/#' matches everything below 'a/' and 'a' itself
+        return topic_prefix_q(prefix, vendor) | Q(topic=prefix[:-1])
+
+    condition = Q(topic__regex=topic_filter_regex(topic_filter))
+    if prefix:
+        condition &= topic_prefix_q(prefix, vendor)
+    return condition
+
+
+def load_distinct_topics(limit=500):
+    """
+    Return up to ``limit`` distinct stored topics in sorted order.
+
+    Uses a recursive "loose index scan" that jumps from one topic to the next
+    through the topic index, so the cost grows with the number of distinct
+    topics rather than the number of stored messages.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            WITH RECURSIVE topics(topic) AS (
+                SELECT MIN(topic) FROM mqtt_service_mqttmessage
+                UNION ALL
+                SELECT (SELECT MIN(topic) FROM mqtt_service_mqttmessage
+                        WHERE topic > topics.topic)
+                FROM topics WHERE topics.topic IS NOT NULL
+            )
+            SELECT topic FROM topics WHERE topic IS NOT NULL LIMIT %s
+        """, [limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def distinct_topics():
+    """Return the cached list of stored topics"""
+    return cache.get_or_set(
+        TOPIC_LIST_CACHE_KEY, load_distinct_topics,
+        settings.MQTT_TOPIC_CACHE_TIMEOUT)
@@ -0,0 +1,192 @@
+"""
+Broker transport: TLS session reuse, reconnect backoff and phase timing
+
+Flaky links reconnect often, so reconnecting is made as cheap as possible:
+
+- every broker keeps one long-lived ``TimedClient``; paho reconnects it in
+  place instead of a new client being built
+- TLS contexts are cached per TLS configuration and offer the last session
+  of each server, so reconnects resume the session instead of doing a full
+  handshake
+- reconnect delays back off exponentially with jitter, so clients that
+  lost the same broker don't reconnect in lockstep
+- the DNS, TCP, TLS, CONNACK and SUBACK phases of each attempt are timed
+"""
+import random
+import socket
+import ssl
+import threading
+import time
+import paho.mqtt.client as mqtt
+
+PHASES = ('dns', 'tcp', 'tls', 'connack', 'suback')
+
+_contexts = {}
+_contexts_lock = threading.Lock()
+
+
+class ResumableSSLContext(ssl.SSLContext):
+    """SSLContext that offers the last session of each server for resumption"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.sessions = {}
+
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+        if session is None and server_hostname is not None:
+            session = self.sessions.get(server_hostname)
+        return super().wrap_socket(
+            sock, *args, server_hostname=server_hostname, session=session, **kwargs)
+
+    def save_session(self, server_hostname, sock):
+        """Remember the session of an established connection for the next handshake"""
+        session = sock.session
+        if session is not None:
+            self.sessions[server_hostname] = session
+
+
+def tls_context(options):
+    """
+    Return the shared ResumableSSLContext for a broker's TLS options
+    (``ca_certs``, ``certfile``, ``keyfile``, ``insecure``).
+    """
+    key = (options.get('ca_certs'), options.get('certfile'),
+           options.get('keyfile'), bool(options.get('insecure')))
+    with _contexts_lock:
+        context = _contexts.get(key)
+        if context is None:
+            ca_certs, certfile, keyfile, insecure = key
+            context = ResumableSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            if ca_certs:
+                context.load_verify_locations(ca_certs)
+            else:
+                context.load_default_certs()
+            if certfile:
+                context.load_cert_chain(certfile, keyfile)
+            context.check_hostname = not insecure
+            _contexts[key] = context
+        return context
+
+
+class ConnectTimings:
+    """Durations of the phases of connection attempts, on one client's network thread"""
+
+    def __init__(self):
+        self.attempts = 0
+        self.tls_resumed = 0
+        self.tls_full = 0
+        self.last = {}
+        self._totals = dict.fromkeys(PHASES, 0.0)
+        self._counts = dict.fromkeys(PHASES, 0)
+        self._mark = None
+        self._pending_subacks = set()
+
+    def begin(self):
+        """Start timing a connection attempt"""
+        self.attempts += 1
+        self.last = {}
+        self._pending_subacks = set()
+        self._mark = time.monotonic()
+
+    def phase(self, name):
+        """Record the end of phase ``name``; the next phase starts now"""
+        if self._mark is None:
+            return
+        now = time.monotonic()
+        self.last[name] = now - self._mark
+        self._totals[name] += now - self._mark
+        self._counts[name] += 1
+        self._mark = now
+
+    def expect_subacks(self, mids):
+        self._pending_subacks.update(mids)
+        if not self._pending_subacks:
+            self._mark = None
+
+    def suback(self, mid):
+        """Record a SUBACK; the phase ends with the last pending one"""
+        if mid in self._pending_subacks:
+            self._pending_subacks.discard(mid)
+            if not self._pending_subacks:
+                self.phase('suback')
+                self._mark = None
+
+    def snapshot(self):
+        return {
+            'attempts': self.attempts,
+            'tls_sessions_resumed': self.tls_resumed,
+            'tls_full_handshakes': self.tls_full,
+            'last_ms': {name: round(self.last[name] * 1000, 2)
+                        for name in PHASES if name in self.last},
+            'mean_ms': {name: round(self._totals[name] / self._counts[name] * 1000, 2)
+                        for name in PHASES if self._counts[name]},
+        }
+
+
+class TimedClient(mqtt.Client):
+    """paho Client that times connection phases and reconnects with jittered backoff"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = ConnectTimings()
+
+    def _create_socket_connection(self):
+        self.timings.begin()
+        if self._get_proxy():
+            sock = super()._create_socket_connection()
+            self.timings.phase('tcp')
+            return sock
+
+        addresses = socket.getaddrinfo(
+            self._host, self._port, 0, socket.SOCK_STREAM)
+        self.timings.phase('dns')
+
+        error = None
+        for family, kind, proto, _, address in addresses:
+            sock = socket.socket(family, kind, proto)
+            try:
+                sock.settimeout(self._connect_timeout)
+                if self._bind_address or self._bind_port:
+                    sock.bind((self._bind_address, self._bind_port))
+                sock.connect(address)
+            except OSError as e:
+                error = e
+                sock.close()
+                continue
+            self.timings.phase('tcp')
+            return sock
+        raise error or OSError(f"getaddrinfo returned no addresses for {self._host}")
+
+    def _call_socket_open(self):
+        # Called once the TLS handshake (if any) is done, before CONNECT is sent
+        if self._ssl and isinstance(self._sock, ssl.SSLSocket):
+            self.timings.phase('tls')
+            if self._sock.session_reused:
+                self.timings.tls_resumed += 1
+            else:
+                self.timings.tls_full += 1
+        super()._call_socket_open()
+
+    def save_tls_session(self):
+        """Keep the TLS session for the next reconnect; call after CONNACK"""
+        if self._ssl and isinstance(self._sock, ssl.SSLSocket) and \
+                isinstance(self._ssl_context, ResumableSSLContext):
+            self._ssl_context.save_session(self._host, self._sock)
+
+    def _reconnect_wait(self):
+        # Exponential backoff between reconnect_delay_set()'s bounds, waiting
+        # a random 50-100% of the delay
+        with self._reconnect_delay_mutex:
+            if self._reconnect_delay is None:
+                self._reconnect_delay = self._reconnect_min_delay
+            else:
+                self._reconnect_delay = min(
+                    self._reconnect_delay * 2, self._reconnect_max_delay)
+            delay = random.uniform(self._reconnect_delay / 2, self._reconnect_delay)
+
+        deadline = time.monotonic() + delay
+        while self._state != mqtt.mqtt_cs_disconnecting and not self._thread_terminate:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, 1))
@@ -3,12 +3,24 @@ URL Configuration for MQTT Service API
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MQTTMessageViewSet, MQTTConnectionViewSet
+from .views import (
+    MQTTMessageViewSet, MQTTMessageAggregateViewSet, QuarantinedMessageViewSet, ShedSummaryViewSet,
+    MQTTConnectionViewSet, AcknowledgeJobViewSet, ReplayJobViewSet,
+)
 
 router = DefaultRouter()
 router.register(r'messages', MQTTMessageViewSet, basename='mqtt-message')
+router.register(r'aggregates', MQTTMessageAggregateViewSet,
+                basename='mqtt-message-aggregate')
+router.register(r'quarantine', QuarantinedMessageViewSet,
+                basename='quarantined-message')
+router.register(r'rate-limit-summaries', ShedSummaryViewSet,
+                basename='shed-summary')
 router.register(r'connections', MQTTConnectionViewSet,
                 basename='mqtt-connection')
+router.register(r'acknowledge-jobs', AcknowledgeJobViewSet,
+                basename='acknowledge-job')
+router.register(r'replay-jobs', ReplayJobViewSet, basename='replay-job')
 
 urlpatterns = [
     path('', include(router.urls)),
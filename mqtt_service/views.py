@@ -1,29 +1,88 @@
 """
 API Views for MQTT Service
 """
-from rest_framework import viewsets, filters, status
-from rest_framework.decorators import action
+from rest_framework import viewsets, filters, mixins, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.decorators import (
+    action, api_view, authentication_classes, permission_classes,
+)
 from rest_framework.response import Response
+from django.conf import settings
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import MQTTMessage, MQTTConnection
-from .serializers import MQTTMessageSerializer, MQTTConnectionSerializer
+from .aggregation import aggregator
+from .apps import mqtt_enabled
+from .filters import MessageSearchFilter, MessageOrderingFilter, MQTTMessageFilter
+from .forwarding import forwarding
+from .memory import memory_profiler
+from .metrics import metrics
+from .models import (
+    MQTTMessage, MQTTMessageAggregate, QuarantinedMessage, MQTTConnection,
+    AcknowledgeJob, ReplayJob, ShedSummary,
+)
+from .pagination import MessagePagination
+from .processing import (
+    acknowledge_messages, start_acknowledge_job, resumable as acknowledge_resumable,
+)
+from .renderers import ORJSONRenderer
+from .replay import start_replay_job, stop_replay_job, resumable
+from .serializers import (
+    MQTTMessageSerializer, MessageRowSerializer, MQTTMessageAggregateSerializer, MQTTConnectionSerializer,
+    QuarantinedMessageSerializer, ShedSummarySerializer,
+    AcknowledgeSerializer, AcknowledgeJobSerializer, ReplayJobSerializer,
+)
 
 
 class MQTTMessageViewSet(viewsets.ModelViewSet):
     """
     ViewSet for MQTT Messages
     - List all messages
-    - Filter by topic and processed status
-    - Mark messages as processed
+    - Filter by topic, MQTT topic filter and processed status
+    - Full-text search over topic and payload
+    - Select response fields with ?fields=topic,timestamp
+    - Mark messages as processed, in bulk by id range, topic filter or time window
     """
     queryset = MQTTMessage.objects.all()
     serializer_class = MQTTMessageSerializer
     filter_backends = [DjangoFilterBackend,
-                       filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['topic', 'processed']
+                       MessageSearchFilter, MessageOrderingFilter]
+    filterset_class = MQTTMessageFilter
     search_fields = ['topic', 'payload']
     ordering_fields = ['timestamp', 'topic']
     ordering = ['-timestamp']
+    pagination_class = MessagePagination
+
+    def requested_fields(self):
+        """Return the fields selected with ?fields=, or None for all fields"""
+        value = self.request.query_params.get('fields')
+        if not value:
+            return None
+        fields = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in fields
+                   if name not in MQTTMessageSerializer.Meta.fields]
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}"})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'list':
+            kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        """
+        JSON responses are built from values() rows by MessageRowSerializer;
+        other formats (the browsable API) use the regular serializer.
+        """
+        if not isinstance(request.accepted_renderer, ORJSONRenderer):
+            return super().list(request, *args, **kwargs)
+
+        rows = MessageRowSerializer(self.requested_fields())
+        queryset = rows.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.render(page))
+        return Response(rows.render(queryset))
 
     @action(detail=False, methods=['post'])
     def mark_processed(self, request):
@@ -35,11 +94,34 @@ class MQTTMessageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        updated_count = MQTTMessage.objects.filter(
-            topic=topic,
-            processed=False
-        ).update(processed=True)
+        updated_count = acknowledge_messages({'topic': topic})
+
+        return Response({
+            'status': 'success',
+            'updated_count': updated_count,
+            'message': f'{updated_count} messages marked as processed'
+        })
+
+    @action(detail=False, methods=['post'])
+    def acknowledge(self, request):
+        """
+        Mark messages matching id range, topic filter and time window as
+        processed, in bounded chunks. With run_async the update runs as a
+        background job whose progress is available under /api/acknowledge-jobs/.
+        """
+        serializer = AcknowledgeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        criteria = serializer.get_criteria()
+        chunk_size = serializer.validated_data['chunk_size']
 
+        if serializer.validated_data['run_async']:
+            job = AcknowledgeJob.objects.create(
+                criteria=criteria, chunk_size=chunk_size)
+            data = AcknowledgeJobSerializer(job).data
+            start_acknowledge_job(job)
+            return Response(data, status=status.HTTP_202_ACCEPTED)
+
+        updated_count = acknowledge_messages(criteria, chunk_size)
         return Response({
             'status': 'success',
             'updated_count': updated_count,
@@ -61,6 +143,61 @@ class MQTTMessageViewSet(viewsets.ModelViewSet):
         })
 
 
+class QuarantinedMessageViewSet(mixins.DestroyModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for quarantined messages
+    - List messages that failed their topic's payload schema, with the error
+    - Delete reviewed entries
+    """
+    queryset = QuarantinedMessage.objects.all()
+    serializer_class = QuarantinedMessageSerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['topic', 'schema_topic']
+    ordering_fields = ['timestamp', 'topic']
+    ordering = ['-timestamp']
+
+
+class ShedSummaryViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for rate limit summaries
+    - List per-topic counts of messages shed by aggregate rate limit rules
+    """
+    queryset = ShedSummary.objects.all()
+    serializer_class = ShedSummarySerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['topic', 'rule_topic']
+    ordering_fields = ['timestamp', 'topic', 'count']
+    ordering = ['-timestamp']
+
+
+class MQTTMessageAggregateViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for aggregated message windows
+    - List window summaries of aggregated topics
+    - View the raw samples kept in memory for a topic
+    """
+    queryset = MQTTMessageAggregate.objects.all()
+    serializer_class = MQTTMessageAggregateSerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['topic']
+    ordering_fields = ['window_start', 'topic']
+    ordering = ['-window_start']
+
+    @action(detail=False, methods=['get'])
+    def recent(self, request):
+        """Get raw samples kept in the ring buffer of a topic (this process only)"""
+        topic = request.query_params.get('topic')
+        if not topic:
+            return Response(
+                {'error': 'topic is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            'topic': topic,
+            'samples': aggregator.recent_samples(topic),
+        })
+
+
 class MQTTConnectionViewSet(viewsets.ModelViewSet):
     """
     ViewSet for MQTT Connection Status
@@ -85,3 +222,134 @@ class MQTTConnectionViewSet(viewsets.ModelViewSet):
                 {'error': 'No connection status found'},
                 status=status.HTTP_404_NOT_FOUND
             )
+
+
+class AcknowledgeJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for bulk mark-processed jobs
+    - View job status and progress
+    - Resume a failed or interrupted job from its checkpoint
+    """
+    queryset = AcknowledgeJob.objects.all()
+    serializer_class = AcknowledgeJobSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status']
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """Restart a failed or interrupted job from its last checkpoint"""
+        job = self.get_object()
+        if not acknowledge_resumable(job) or start_acknowledge_job(job) is None:
+            return Response(
+                {'error': f'Acknowledge job {job.id} is {job.status}'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(self.get_serializer(job).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+
+class ReplayJobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for message replay jobs
+    - Create a replay (starts immediately in the background)
+    - Pause and resume a running replay
+    - View replay progress
+    """
+    queryset = ReplayJob.objects.all()
+    serializer_class = ReplayJobSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status']
+
+    def perform_create(self, serializer):
+        job = serializer.save()
+        start_replay_job(job)
+
+    @action(detail=True, methods=['post'])
+    def pause(self, request, pk=None):
+        """Pause a replay running in this process"""
+        job = self.get_object()
+        if not stop_replay_job(job.id):
+            return Response(
+                {'error': f'Replay job {job.id} is not running in this process'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({'status': 'pausing'})
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """Resume a paused or failed replay from its checkpoint"""
+        job = self.get_object()
+        if not resumable(job):
+            return Response(
+                {'error': f'Replay job {job.id} is {job.status}'},
+                status=status.HTTP_409_CONFLICT
+            )
+        start_replay_job(job)
+        return Response(self.get_serializer(job).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+
+def _broker_status():
+    """In-memory broker status; never imports the MQTT client when it is disabled"""
+    if not mqtt_enabled():
+        return {'state': 'disabled', 'connected': False}
+    from .mqtt_client import MQTTClientManager
+    return MQTTClientManager.status()
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([])
+def healthz(request):
+    """Liveness probe: the process is up; reports broker and ingest state"""
+    return Response({
+        'status': 'ok',
+        'broker': _broker_status(),
+        'ingest': metrics.snapshot(),
+        'forwarding': forwarding.snapshot(),
+    })
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([])
+def readyz(request):
+    """
+    Readiness probe: 503 while the broker is not connected (when this process
+    runs the MQTT client), the ingest writer thread has stopped, messages were
+    dropped from a full ingest queue in the last minute or the ingest backlog
+    exceeds its thresholds.
+    """
+    broker = _broker_status()
+    ingest = metrics.snapshot()
+
+    reasons = []
+    if broker['state'] != 'disabled' and not broker['connected']:
+        reasons.append(f"broker {broker['state']}")
+    if ingest['writer_stopped']:
+        reasons.append("ingest writer stopped")
+    if ingest['dropped_last_minute']:
+        reasons.append(f"ingest dropped {ingest['dropped_last_minute']} messages in the last minute")
+    if ingest['queue_depth'] > settings.MQTT_READY_MAX_QUEUE_DEPTH:
+        reasons.append(f"ingest queue depth {ingest['queue_depth']}")
+    if ingest['write_lag_seconds'] > settings.MQTT_READY_MAX_WRITE_LAG:
+        reasons.append(f"write lag {ingest['write_lag_seconds']}s")
+
+    return Response({
+        'status': 'unavailable' if reasons else 'ok',
+        'reasons': reasons,
+        'broker': broker,
+        'ingest': ingest,
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE if reasons else status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def memoryz(request):
+    """
+    Memory report of this process: RSS, database guard counters and, with
+    MQTT_MEMORY_PROFILING, the top tracemalloc allocators. ?fresh=1 takes a
+    new report instead of returning the latest periodic one.
+    """
+    fresh = request.query_params.get('fresh') in ('1', 'true')
+    return Response(memory_profiler.report(fresh=fresh))
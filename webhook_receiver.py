@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Local Webhook Receiver
+Stand-in for a downstream system receiving messages from an "http"
+forwarder (MQTT_FORWARDERS). Accepts gzip or plain JSON array batches over
+keep-alive connections and prints a summary every second.
+
+Usage: python webhook_receiver.py [--port 8090] [--fail-every N] [--quiet]
+
+With --fail-every N every Nth request is answered with 503 to exercise
+retries. Example forwarder:
+MQTT_FORWARDERS=[{"name": "local", "type": "http", "url": "http://localhost:8090/hook"}]
+"""
+import argparse
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class WebhookReceiver(ThreadingHTTPServer):
+    """HTTP server counting received batches, messages and connections"""
+    daemon_threads = True
+
+    def __init__(self, address, fail_every=0):
+        super().__init__(address, WebhookHandler)
+        self.fail_every = fail_every
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.messages = []
+        self.bytes_received = 0
+        self.connections = 0
+
+    def record(self, body, messages):
+        with self.lock:
+            self.batches += 1
+            self.bytes_received += len(body)
+            self.messages.extend(messages)
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            self.server.requests += 1
+            fail = self.server.fail_every and \
+                self.server.requests % self.server.fail_every == 0
+        if fail:
+            return self.respond(503)
+
+        data = gzip.decompress(body) \
+            if self.headers.get('Content-Encoding') == 'gzip' else body
+        try:
+            messages = json.loads(data)
+        except ValueError:
+            return self.respond(400)
+        self.server.record(body, messages)
+        self.respond(204)
+
+    def respond(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--fail-every', type=int, default=0)
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    server = WebhookReceiver(('', args.port), args.fail_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Listening on http://localhost:{args.port}/")
+
+    seen = 0
+    try:
+        while True:
+            time.sleep(1)
+            with server.lock:
+                new = server.messages[seen:]
+                seen = len(server.messages)
+            if new:
+                print(f"+{len(new)} messages (total {seen} in {server.batches} batches, "
+                      f"{server.connections} connections, {server.bytes_received} bytes)")
+                if not args.quiet:
+                    for message in new[:5]:
+                        print(f"  {message.get('topic')}: {message.get('payload')}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()